@@ -49,12 +49,20 @@ def create_app(config_class='app.config.Config'):
     from app.routes.events import events_bp
     from app.routes.reports import reports_bp
     from app.routes.guests_import import guests_import_bp
+    from app.routes.photos import photos_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(guests_bp)
     app.register_blueprint(events_bp)
     app.register_blueprint(reports_bp)
     app.register_blueprint(guests_import_bp)
+    app.register_blueprint(photos_bp)
+    
+    # Register CLI commands
+    from app.commands import photos_cli, guests_cli, analytics_cli
+    app.cli.add_command(photos_cli)
+    app.cli.add_command(guests_cli)
+    app.cli.add_command(analytics_cli)
     
     # Register error handlers
     @app.errorhandler(404)
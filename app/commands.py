@@ -0,0 +1,93 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.models import db, Guest, EventAttendance, bump_guests_version, bump_engagement_version
+from app.services.analytics import refresh_engagement_summary
+from app.services.donor_capacity import parse_donor_capacity
+from app.services.photo import collect_orphaned_photos, generate_missing_webp
+
+photos_cli = AppGroup('photos', help='Manage stored guest photos.')
+
+@photos_cli.command('gc')
+@click.option('--grace-hours', default=24.0, show_default=True,
+              help='Only collect orphans older than this many hours.')
+@click.option('--quarantine', type=click.Path(file_okay=False),
+              help='Move orphans into this folder instead of deleting them.')
+@click.option('--dry-run', is_flag=True, help='Report orphans without removing them.')
+def collect_garbage(grace_hours, quarantine, dry_run):
+    """Remove photo files that no guest references."""
+    result = collect_orphaned_photos(
+        grace_period=grace_hours * 60 * 60,
+        quarantine_path=quarantine,
+        dry_run=dry_run
+    )
+
+    action = 'Would reclaim' if dry_run else ('Quarantined' if quarantine else 'Reclaimed')
+    click.echo(f"Scanned {result['scanned']} files, {result['orphaned']} orphaned "
+               f"({result['kept_recent']} newer orphans kept for the grace period).")
+    click.echo(f"{action} {result['bytes_reclaimed']:,} bytes.")
+
+    for error in result['errors']:
+        click.echo(f"Error: {error}", err=True)
+
+
+@photos_cli.command('webp')
+def create_webp_derivatives():
+    """Create WebP derivatives for photos that don't have one yet."""
+    written = generate_missing_webp()
+    click.echo(f"Created {written} WebP derivatives.")
+
+
+guests_cli = AppGroup('guests', help='Maintain guest records.')
+
+@guests_cli.command('capacity')
+@click.option('--batch-size', default=1000, show_default=True, help='Guests updated per transaction.')
+def rescore_donor_capacity(batch_size):
+    """Recompute donor capacity amounts, e.g. after changing the label maps."""
+    labels = current_app.config.get('DONOR_CAPACITY_LABELS')
+    ratings = current_app.config.get('DONOR_CAPACITY_RATINGS')
+
+    changed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Guest.id, Guest.user_id, Guest.donor_capacity, Guest.donor_capacity_amount)
+            .where(Guest.id > last_id)
+            .order_by(Guest.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        updates = []
+        user_ids = set()
+        for row in rows:
+            amount = parse_donor_capacity(row.donor_capacity, labels, ratings)
+            if amount != row.donor_capacity_amount:
+                updates.append({'id': row.id, 'donor_capacity_amount': amount})
+                user_ids.add(row.user_id)
+
+        if updates:
+            db.session.execute(db.update(Guest), updates)
+            # Bulk statements bypass the session's change tracking; bump the
+            # versions behind the cached facet counts and engagement summaries
+            guest_ids = [update['id'] for update in updates]
+            bump_guests_version(user_ids)
+            bump_engagement_version(db.session.execute(
+                db.select(EventAttendance.event_id).where(EventAttendance.guest_id.in_(guest_ids)).distinct()
+            ).scalars().all())
+            db.session.commit()
+            changed += len(updates)
+        last_id = rows[-1].id
+
+    click.echo(f"Updated donor capacity amounts for {changed} guests.")
+
+
+analytics_cli = AppGroup('analytics', help='Maintain engagement analytics.')
+
+@analytics_cli.command('refresh')
+def refresh_engagement():
+    """Re-summarize events whose attendance changed, e.g. from cron."""
+    refreshed = refresh_engagement_summary()
+    click.echo(f"Refreshed the engagement summary of {refreshed} events.")
\ No newline at end of file
@@ -17,6 +17,39 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
     UPLOAD_EXTENSIONS = ['.jpg', '.png', '.jpeg']
     UPLOAD_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app', 'static', 'photos')
+    PHOTO_IMPORT_WORKERS = int(os.environ['PHOTO_IMPORT_WORKERS']) if os.environ.get('PHOTO_IMPORT_WORKERS') else None
+    # Limits on what a photo archive may expand to, so a small zip can't
+    # exhaust a worker's memory; photos are read and resized in batches
+    PHOTO_ARCHIVE_MAX_FILE_SIZE = 16 * 1024 * 1024
+    PHOTO_ARCHIVE_MAX_TOTAL_SIZE = 512 * 1024 * 1024
+    PHOTO_IMPORT_BATCH_SIZE = 64
+    PHOTO_DEFAULT_MAX_AGE = 24 * 60 * 60  # Cache lifetime for photos that can change, e.g. the default avatar
+    
+    # Donor capacity values are free text; these map the named labels and
+    # prospect research ratings in use to the dollar amounts used for range
+    # filtering and sorting. Anything else is parsed as an amount ("$250K").
+    # After changing these run `flask guests capacity` to rescore guests.
+    DONOR_CAPACITY_LABELS = {
+        'tbd': None,
+        'unknown': None,
+        'low': 10_000,
+        'medium': 100_000,
+        'high': 1_000_000,
+    }
+    DONOR_CAPACITY_RATINGS = {
+        1: 10_000_000,
+        2: 5_000_000,
+        3: 1_000_000,
+        4: 500_000,
+        5: 250_000,
+        6: 100_000,
+        7: 50_000,
+        8: 25_000,
+        9: 10_000,
+    }
+    
+    # Let the front-end server (nginx X-Accel / Apache mod_xsendfile) deliver files
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', 'False').lower() == 'true'
     
     # Security settings
     SESSION_COOKIE_SECURE = os.environ.get('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
@@ -1,8 +1,11 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed, FileRequired
-from wtforms import StringField, TextAreaField, DateTimeField, SelectField, SubmitField
-from wtforms.validators import DataRequired, Optional, Length
+from flask_login import current_user
+from wtforms import StringField, TextAreaField, DateTimeField, SelectField, IntegerField, BooleanField, SubmitField
+from wtforms.validators import DataRequired, Optional, Length, ValidationError
+from wtforms.widgets import HiddenInput
 from datetime import datetime
+from app.models import Guest
 
 class EventForm(FlaskForm):
     name = StringField('Event Name', validators=[DataRequired(), Length(max=128)])
@@ -28,14 +31,41 @@ class EventSearchForm(FlaskForm):
     )
     submit = SubmitField('Search')
 
+class EventRangeDeleteForm(FlaskForm):
+    date_from = DateTimeField('From Date', format='%Y-%m-%d', validators=[DataRequired()])
+    date_to = DateTimeField('To Date', format='%Y-%m-%d', validators=[DataRequired()])
+    confirm = BooleanField('I understand that these events and their attendee lists will be permanently deleted',
+                           validators=[DataRequired(message='Confirm the deletion to continue.')])
+    submit = SubmitField('Delete Events')
+    
+    def validate_date_to(self, date_to):
+        if self.date_from.data and date_to.data and date_to.data < self.date_from.data:
+            raise ValidationError('The end date must not be before the start date.')
+
 class AttendeeForm(FlaskForm):
-    guest_id = SelectField('Guest', coerce=int, validators=[DataRequired()])
+    # Filled in by the guest typeahead rather than a select of every guest
+    guest_id = IntegerField('Guest', widget=HiddenInput(),
+                            validators=[DataRequired(message='Select a guest from the suggestions.')])
     notes = TextAreaField('Notes', validators=[Optional()])
     submit = SubmitField('Add Attendee')
+    
+    def validate_guest_id(self, guest_id):
+        # Look up just the submitted guest, scoped to the current user
+        guest = Guest.query.filter_by(id=guest_id.data, user_id=current_user.id).first()
+        if guest is None:
+            raise ValidationError('Select one of your guests from the suggestions.')
+        self.guest = guest
 
 class EventbriteImportForm(FlaskForm):
     file = FileField('Eventbrite CSV File', validators=[
         FileRequired(),
         FileAllowed(['csv'], 'CSV files only!')
     ])
+    submit = SubmitField('Import Attendees')
+
+class BatchAttendeeImportForm(FlaskForm):
+    file = FileField('Attendee Spreadsheet', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'xlsx', 'xls'], 'CSV or Excel files only!')
+    ])
     submit = SubmitField('Import Attendees')
\ No newline at end of file
@@ -59,4 +59,11 @@ class GuestForm(FlaskForm):
 
 class GuestSearchForm(FlaskForm):
     search = StringField('Search', validators=[Optional()])
+    # Facet filters, the choices are filled in from the facet counts
+    donor_capacity = SelectField('Donor Capacity', choices=[], validate_choice=False, validators=[Optional()])
+    prospect_manager = SelectField('Prospect Manager', choices=[], validate_choice=False, validators=[Optional()])
+    organization = SelectField('Organization', choices=[], validate_choice=False, validators=[Optional()])
+    # Donor capacity range, parsed like donor capacity values ("$100K", "High")
+    capacity_min = StringField('Minimum Capacity', validators=[Optional()])
+    capacity_max = StringField('Maximum Capacity', validators=[Optional()])
     submit = SubmitField('Search')
\ No newline at end of file
@@ -1,11 +1,26 @@
+from flask import url_for, current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.engine import Engine
 from datetime import datetime
 import os
+import sqlite3
+
+from app.services.donor_capacity import parse_donor_capacity
 
 db = SQLAlchemy()
 
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys, ON DELETE CASCADE included, on
+    # connections that ask for it
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+db.event.listen(Engine, 'connect', _enable_sqlite_foreign_keys)
+
 class User(UserMixin, db.Model):
     """User model for authentication and access control."""
     id = db.Column(db.Integer, primary_key=True)
@@ -14,6 +29,9 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(128))
     is_admin = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Incremented whenever one of the user's guests changes, so caches of
+    # values derived from the guest list know when they are stale
+    guests_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     guests = db.relationship('Guest', back_populates='user', lazy='dynamic')
 
     def set_password(self, password):
@@ -36,10 +54,13 @@ class Guest(db.Model):
     phone = db.Column(db.String(20))
     organization = db.Column(db.String(128))
     title = db.Column(db.String(128))
-    bio = db.Column(db.Text)
+    bio = db.deferred(db.Column(db.Text))
     photo_filename = db.Column(db.String(128))
     donor_capacity = db.Column(db.String(64))
-    notes = db.Column(db.Text)
+    # Dollar amount derived from donor_capacity on every write, for range
+    # filters and numeric sorting
+    donor_capacity_amount = db.Column(db.BigInteger)
+    notes = db.deferred(db.Column(db.Text))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -55,7 +76,22 @@ class Guest(db.Model):
     descriptor = db.Column(db.String(256))
     
     # Relationships
-    event_attendances = db.relationship('EventAttendance', back_populates='guest', lazy='dynamic')
+    # Attendances are removed by the database (ON DELETE CASCADE) rather than
+    # loaded and deleted one by one
+    event_attendances = db.relationship('EventAttendance', back_populates='guest', lazy='dynamic',
+                                        cascade="all, delete-orphan", passive_deletes=True)
+    
+    # Every sort offered by the guest directory is an index-ordered scan of one
+    # user's guests, with id as the final tie-breaker for keyset pagination
+    __table_args__ = (
+        db.Index('ix_guest_user_name', 'user_id', 'last_name', 'first_name', 'id'),
+        db.Index('ix_guest_user_organization', 'user_id', 'organization', 'id'),
+        db.Index('ix_guest_user_email', 'user_id', 'email', 'id'),
+        # Directory facets are counted with one GROUP BY per column
+        db.Index('ix_guest_user_donor_capacity', 'user_id', 'donor_capacity'),
+        db.Index('ix_guest_user_prospect_manager', 'user_id', 'prospect_manager'),
+        db.Index('ix_guest_user_donor_capacity_amount', 'user_id', 'donor_capacity_amount', 'id'),
+    )
     
     @property
     def full_name(self):
@@ -84,12 +120,32 @@ class Guest(db.Model):
     @property
     def photo_url(self):
         if self.photo_filename:
-            return f"/static/photos/{self.photo_filename}"
-        return "/static/photos/default.png"
+            return url_for('photos.serve', filename=self.photo_filename)
+        return url_for('photos.serve', filename='default.png')
     
     def __repr__(self):
         return f'<Guest {self.full_name}>'
 
+# Columns rendered by guest list views (directory, attendee tables). Use with
+# load_only(); the unbounded bio and notes columns are deferred on the model
+# and detail views opt back in with undefer().
+GUEST_LIST_COLUMNS = (
+    Guest.id, Guest.user_id, Guest.prefix, Guest.first_name, Guest.middle_name,
+    Guest.last_name, Guest.nickname, Guest.email, Guest.organization, Guest.photo_filename,
+)
+
+class Photo(db.Model):
+    """Content-addressed photo file shared by every guest that references it."""
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    filename = db.Column(db.String(128), unique=True, nullable=False)
+    size = db.Column(db.Integer)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Photo {self.filename} ({self.ref_count} refs)>'
+
 class Event(db.Model):
     """Event model to track organized events."""
     id = db.Column(db.Integer, primary_key=True)
@@ -98,15 +154,67 @@ class Event(db.Model):
     location = db.Column(db.String(256))
     description = db.Column(db.Text)
     eventbrite_id = db.Column(db.String(64))
+    # Highest Eventbrite order number applied by the export sync and when it
+    # last ran (see app.services.eventbrite)
+    eventbrite_last_order = db.Column(db.BigInteger)
+    eventbrite_synced_at = db.Column(db.DateTime)
+    # Incremented whenever the attendee list (or an attendee's name) changes,
+    # so per-worker caches like the check-in index know when they are stale
+    attendance_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Incremented on any change that affects engagement analytics, including
+    # check-ins; summarized_version is the version EngagementSummary was last
+    # refreshed at (NULL until the first refresh)
+    engagement_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    summarized_version = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    attendances = db.relationship('EventAttendance', back_populates='event', lazy='dynamic', cascade="all, delete-orphan")
+    # Deleting an event leaves its attendances and summaries to the database's
+    # ON DELETE CASCADE instead of loading every row into the session
+    attendances = db.relationship('EventAttendance', back_populates='event', lazy='dynamic',
+                                  cascade="all, delete-orphan", passive_deletes=True)
+    engagement_summaries = db.relationship('EngagementSummary', lazy='dynamic',
+                                           cascade="all, delete-orphan", passive_deletes=True)
+    
+    # Backing indexes for the sorts offered by the event listing
+    __table_args__ = (
+        db.Index('ix_event_date_id', 'date', 'id'),
+        db.Index('ix_event_name_id', 'name', 'id'),
+    )
     
     @property
     def attendee_count(self):
-        return self.attendances.count()
+        # Listings fill this in for a whole page with load_attendee_counts()
+        count = self.__dict__.get('_attendee_count')
+        if count is None:
+            count = self._attendee_count = self.attendances.count()
+        return count
+    
+    @classmethod
+    def load_attendee_counts(cls, events):
+        """
+        Fill in attendee_count for many events with one grouped query,
+        instead of one COUNT per event as the listing is rendered.
+        
+        Args:
+            events: Event instances, e.g. one page of a listing
+            
+        Returns:
+            The same events
+        """
+        ids = [event.id for event in events]
+        counts = {}
+        if ids:
+            counts = dict(db.session.execute(
+                db.select(EventAttendance.event_id, db.func.count())
+                .where(EventAttendance.event_id.in_(ids))
+                .group_by(EventAttendance.event_id)
+            ).all())
+        
+        for event in events:
+            event._attendee_count = counts.get(event.id, 0)
+        return events
     
     def __repr__(self):
         return f'<Event {self.name} on {self.date}>'
@@ -114,11 +222,16 @@ class Event(db.Model):
 class EventAttendance(db.Model):
     """Association model between guests and events."""
     id = db.Column(db.Integer, primary_key=True)
-    guest_id = db.Column(db.Integer, db.ForeignKey('guest.id'), nullable=False)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
+    guest_id = db.Column(db.Integer, db.ForeignKey('guest.id', ondelete='CASCADE'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), nullable=False)
     registration_date = db.Column(db.DateTime, default=datetime.utcnow)
     attended = db.Column(db.Boolean, default=False)
     notes = db.Column(db.Text)
+    # Stable keys of the Eventbrite registration this attendance was synced
+    # from, plus a fingerprint of the export row to detect changes
+    eventbrite_attendee_id = db.Column(db.String(64))
+    eventbrite_order_id = db.Column(db.BigInteger)
+    eventbrite_row_hash = db.Column(db.String(40))
     
     # Relationships
     guest = db.relationship('Guest', back_populates='event_attendances')
@@ -126,7 +239,273 @@ class EventAttendance(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('guest_id', 'event_id', name='_guest_event_uc'),
+        # The unique constraint leads with guest_id; per-event lookups and
+        # attendee counts need event_id first
+        db.Index('ix_event_attendance_event_guest', 'event_id', 'guest_id'),
+        db.Index('ix_event_attendance_eventbrite_attendee', 'event_id', 'eventbrite_attendee_id', unique=True),
     )
     
     def __repr__(self):
-        return f'<Attendance: {self.guest.full_name} at {self.event.name}>'
\ No newline at end of file
+        return f'<Attendance: {self.guest.full_name} at {self.event.name}>'
+
+class EngagementSummary(db.Model):
+    """
+    Materialized attendance counts per event, broken down by the guest's
+    owner, prospect manager and donor capacity band. Maintained by
+    app.services.analytics, which re-summarizes only events whose
+    engagement_version moved since their last refresh.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id', ondelete='CASCADE'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    prospect_manager = db.Column(db.String(128))
+    capacity_band = db.Column(db.String(32), nullable=False)
+    invited = db.Column(db.Integer, nullable=False, default=0)
+    attended = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<EngagementSummary event={self.event_id} {self.prospect_manager}/{self.capacity_band}>'
+
+class DataVersion(db.Model):
+    """
+    Global version counters for caches derived from many rows at once, such
+    as the attendance matrices, which would otherwise have to aggregate the
+    per-event versions to tell whether they are stale.
+    """
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    def __repr__(self):
+        return f'<DataVersion {self.name}={self.version}>'
+
+# Counters kept in DataVersion, seeded when the table is created.
+# 'engagement_summary' holds the 'engagement' version the materialized
+# engagement summary was last refreshed at.
+DATA_VERSION_NAMES = ('attendance', 'engagement', 'engagement_summary')
+
+def _seed_data_versions(target, connection, **kw):
+    connection.execute(target.insert(), [{'name': name, 'version': 0} for name in DATA_VERSION_NAMES])
+
+db.event.listen(DataVersion.__table__, 'after_create', _seed_data_versions)
+
+def get_data_version(name):
+    """Return the current value of a global DataVersion counter."""
+    return db.session.execute(
+        db.select(DataVersion.version).where(DataVersion.name == name)
+    ).scalar() or 0
+
+def _bump_data_version(execute, *names):
+    versions = DataVersion.__table__
+    execute(
+        db.update(versions)
+        .where(versions.c.name.in_(names))
+        .values(version=versions.c.version + 1)
+    )
+
+def bump_data_version(*names):
+    """
+    Advance global DataVersion counters, e.g. after bulk statements that
+    delete events without going through the session.
+    """
+    _bump_data_version(db.session.execute, *names)
+
+def _score_donor_capacity(mapper, connection, target):
+    state = db.inspect(target)
+    # Guests loaded with load_only() would otherwise lazy-load donor_capacity
+    # one by one during the flush, just to score an unchanged value
+    if state.persistent and ('donor_capacity' in state.unloaded
+                             or not state.attrs.donor_capacity.history.has_changes()):
+        return
+    target.donor_capacity_amount = parse_donor_capacity(
+        target.donor_capacity,
+        current_app.config.get('DONOR_CAPACITY_LABELS'),
+        current_app.config.get('DONOR_CAPACITY_RATINGS')
+    )
+
+db.event.listen(Guest, 'before_insert', _score_donor_capacity)
+db.event.listen(Guest, 'before_update', _score_donor_capacity)
+
+def bump_guests_version(user_ids):
+    """
+    Mark the guest lists of the given users as changed.
+    
+    ORM changes are picked up automatically on flush; call this after bulk
+    statements that modify guests without going through the session.
+    """
+    user_ids = [user_id for user_id in set(user_ids) if user_id is not None]
+    if user_ids:
+        db.session.execute(
+            db.update(User)
+            .where(User.id.in_(user_ids))
+            .values(guests_version=User.guests_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+def _guests_changed(session, flush_context):
+    user_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Guest):
+            user_ids.add(obj.user_id)
+            # A guest moved to another user changes both guest lists
+            user_ids.update(db.inspect(obj).attrs.user_id.history.deleted)
+    
+    user_ids.discard(None)
+    if user_ids:
+        session.connection().execute(
+            db.update(User.__table__)
+            .where(User.__table__.c.id.in_(user_ids))
+            .values(guests_version=User.__table__.c.guests_version + 1)
+        )
+
+db.event.listen(db.session, 'after_flush', _guests_changed)
+
+# Guest columns shown in attendee lists; changing them makes cached attendee
+# lists of the guest's events stale
+ATTENDEE_NAME_COLUMNS = ('prefix', 'first_name', 'middle_name', 'last_name', 'nickname', 'organization')
+
+# Guest columns that engagement analytics are broken down by
+ENGAGEMENT_SEGMENT_COLUMNS = ('user_id', 'prospect_manager', 'donor_capacity_amount')
+
+def _bump_event_versions(execute, event_ids, attendance=True, engagement=True):
+    events = Event.__table__
+    values = {}
+    names = []
+    if attendance:
+        values['attendance_version'] = events.c.attendance_version + 1
+        names.append('attendance')
+    if engagement:
+        values['engagement_version'] = events.c.engagement_version + 1
+        names.append('engagement')
+    execute(db.update(events).where(events.c.id.in_(event_ids)).values(**values))
+    _bump_data_version(execute, *names)
+
+def bump_attendance_version(event_ids):
+    """
+    Mark the attendee lists of the given events as changed.
+    
+    ORM changes are picked up automatically on flush; call this after bulk
+    statements that add or remove attendances without going through the
+    session.
+    """
+    event_ids = [event_id for event_id in set(event_ids) if event_id is not None]
+    if event_ids:
+        _bump_event_versions(db.session.execute, event_ids)
+
+def bump_engagement_version(event_ids):
+    """
+    Mark the engagement analytics of the given events as stale, e.g. after
+    bulk statements that check attendees in.
+    """
+    event_ids = [event_id for event_id in set(event_ids) if event_id is not None]
+    if event_ids:
+        _bump_event_versions(db.session.execute, event_ids, attendance=False)
+
+def _events_of_guests(guest_ids):
+    attendances = EventAttendance.__table__
+    return db.select(attendances.c.event_id).where(attendances.c.guest_id.in_(guest_ids))
+
+def _attendances_changed(session, flush_context):
+    event_ids = set()
+    checkin_event_ids = set()
+    renamed_guest_ids = set()
+    segment_guest_ids = set()
+    
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, EventAttendance):
+            event_ids.add(obj.event_id)
+    
+    for obj in session.dirty:
+        state = db.inspect(obj)
+        if isinstance(obj, EventAttendance):
+            # Moving an attendance changes the lists, checking in only the analytics
+            history = state.attrs.event_id.history
+            if history.has_changes():
+                event_ids.update(history.added)
+                event_ids.update(history.deleted)
+            if state.attrs.guest_id.history.has_changes():
+                event_ids.add(obj.event_id)
+            if state.attrs.attended.history.has_changes():
+                checkin_event_ids.add(obj.event_id)
+        elif isinstance(obj, Guest) and obj.id is not None:
+            if any(state.attrs[name].history.has_changes() for name in ATTENDEE_NAME_COLUMNS):
+                renamed_guest_ids.add(obj.id)
+            if any(state.attrs[name].history.has_changes() for name in ENGAGEMENT_SEGMENT_COLUMNS):
+                segment_guest_ids.add(obj.id)
+    
+    event_ids.discard(None)
+    checkin_event_ids.discard(None)
+    checkin_event_ids -= event_ids
+    execute = session.connection().execute
+    
+    if event_ids:
+        _bump_event_versions(execute, event_ids)
+    if checkin_event_ids:
+        _bump_event_versions(execute, checkin_event_ids, attendance=False)
+    if renamed_guest_ids:
+        _bump_event_versions(execute, _events_of_guests(renamed_guest_ids), engagement=False)
+    if segment_guest_ids:
+        _bump_event_versions(execute, _events_of_guests(segment_guest_ids), attendance=False)
+
+db.event.listen(db.session, 'after_flush', _attendances_changed)
+
+def _guests_deleting(session, flush_context, instances):
+    # The attendances of a deleted guest go with it through ON DELETE CASCADE
+    # and never pass through the session, so their events are bumped before
+    # the rows disappear
+    guest_ids = [obj.id for obj in session.deleted if isinstance(obj, Guest) and obj.id is not None]
+    if guest_ids:
+        _bump_event_versions(session.connection().execute, _events_of_guests(guest_ids))
+
+db.event.listen(db.session, 'before_flush', _guests_deleting)
+
+def _events_deleting(session, flush_context, instances):
+    # A deleted event's attendances and summaries also go through ON DELETE
+    # CASCADE, so the global counters are bumped here instead
+    if any(isinstance(obj, Event) for obj in session.deleted):
+        _bump_data_version(session.connection().execute, 'attendance', 'engagement')
+
+db.event.listen(db.session, 'before_flush', _events_deleting)
+
+# Full-text search index for the guest directory. SQLite keeps an external
+# content FTS5 table in sync through triggers; PostgreSQL uses a GIN index over
+# the same tsvector expression that app.services.search queries with. Both are
+# maintained by the database itself, so every write path stays in sync.
+GUEST_SEARCH_COLUMNS = ('first_name', 'last_name', 'nickname', 'email',
+                        'organization', 'athena_id', 'prospect_manager')
+
+def _guest_fts_values(prefix):
+    return ', '.join(f'{prefix}.{column}' for column in GUEST_SEARCH_COLUMNS)
+
+GUEST_FTS_DDL = [
+    f"""CREATE VIRTUAL TABLE guest_fts USING fts5(
+        {', '.join(GUEST_SEARCH_COLUMNS)},
+        content='guest', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER guest_fts_ai AFTER INSERT ON guest BEGIN
+        INSERT INTO guest_fts(rowid, {', '.join(GUEST_SEARCH_COLUMNS)})
+        VALUES (new.id, {_guest_fts_values('new')});
+    END""",
+    f"""CREATE TRIGGER guest_fts_ad AFTER DELETE ON guest BEGIN
+        INSERT INTO guest_fts(guest_fts, rowid, {', '.join(GUEST_SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {_guest_fts_values('old')});
+    END""",
+    f"""CREATE TRIGGER guest_fts_au AFTER UPDATE OF {', '.join(GUEST_SEARCH_COLUMNS)} ON guest BEGIN
+        INSERT INTO guest_fts(guest_fts, rowid, {', '.join(GUEST_SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {_guest_fts_values('old')});
+        INSERT INTO guest_fts(rowid, {', '.join(GUEST_SEARCH_COLUMNS)})
+        VALUES (new.id, {_guest_fts_values('new')});
+    END""",
+]
+
+GUEST_SEARCH_DOCUMENT = "to_tsvector('simple'::regconfig, {})".format(
+    " || ' ' || ".join(f"coalesce({column}, '')" for column in GUEST_SEARCH_COLUMNS)
+)
+
+for statement in GUEST_FTS_DDL:
+    db.event.listen(Guest.__table__, 'after_create', db.DDL(statement).execute_if(dialect='sqlite'))
+db.event.listen(Guest.__table__, 'before_drop', db.DDL('DROP TABLE IF EXISTS guest_fts').execute_if(dialect='sqlite'))
+db.event.listen(
+    Guest.__table__, 'after_create',
+    db.DDL(f"CREATE INDEX ix_guest_search ON guest USING GIN ({GUEST_SEARCH_DOCUMENT})").execute_if(dialect='postgresql')
+)
@@ -1,19 +1,34 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, abort, Response, stream_with_context
 from flask_login import login_required, current_user
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
+from sqlalchemy.orm import contains_eager, load_only
+from werkzeug.utils import secure_filename
 
-from app.models import db, Event, Guest, EventAttendance
-from app.forms.events import EventForm, EventSearchForm, AttendeeForm
-from app.services.import_service import process_attendee_file
+from app.models import db, Event, Guest, EventAttendance, GUEST_LIST_COLUMNS
+from app.forms.events import EventForm, EventSearchForm, EventRangeDeleteForm, AttendeeForm, EventbriteImportForm, BatchAttendeeImportForm
+from app.services.import_service import process_attendee_file, process_batch_attendee_file
+from app.services.events import delete_events_between
+from app.services.eventbrite import sync_eventbrite_export
+from app.services.attendance import add_attendees, remove_attendances, mark_attended
+from app.services.checkin import search_checkin, set_checked_in, checked_in_count
+from app.services.recommendations import recommend_guests
+from app.services.pagination import keyset_paginate
+from app.services.exports import EXPORT_FORMATS, ATTENDEE_EXPORT_COLUMNS, ATTENDEE_EXPORT_LOAD_COLUMNS, iter_csv, iter_xlsx, export_filename
 
 events_bp = Blueprint('events', __name__, url_prefix='/events')
 
+# Sort orders offered by the event listing, each backed by a (column, id) index
+EVENT_SORTS = {
+    'date': Event.date,
+    'name': Event.name,
+}
+
 @events_bp.route('/', methods=['GET'])
 @login_required
 def index():
     form = EventSearchForm(request.args)
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     
     query = Event.query
     
@@ -30,16 +45,16 @@ def index():
     
     # Apply sorting
     sort_by = request.args.get('sort_by', 'date')
-    sort_direction = request.args.get('sort_direction', 'desc')
+    if sort_by not in EVENT_SORTS:
+        sort_by = 'date'
+    sort_direction = 'asc' if request.args.get('sort_direction') == 'asc' else 'desc'
     
-    if sort_direction == 'desc':
-        query = query.order_by(getattr(Event, sort_by).desc())
-    else:
-        query = query.order_by(getattr(Event, sort_by))
+    descending = sort_direction == 'desc'
+    keys = [(EVENT_SORTS[sort_by], descending), (Event.id, descending)]
     
-    # Paginate the results
-    pagination = query.paginate(page=page, per_page=10, error_out=False)
-    events = pagination.items
+    # Paginate the results, the id tie-breaker keeps the sort key unique
+    pagination = keyset_paginate(query, keys, cursor=cursor, per_page=10)
+    events = Event.load_attendee_counts(pagination.items)
     
     return render_template(
         'events/index.html',
@@ -98,13 +113,22 @@ def create():
 @login_required
 def view(id):
     event = Event.query.get_or_404(id)
-    attendees = event.attendances.join(Guest).order_by(Guest.last_name).all()
+    # Load the attendances and the listed guest columns in a single query, so
+    # rendering attendance.guest never lazy loads
+    attendees = (
+        event.attendances.join(EventAttendance.guest)
+        .options(contains_eager(EventAttendance.guest).load_only(*GUEST_LIST_COLUMNS))
+        .order_by(Guest.last_name, Guest.first_name, EventAttendance.id)
+        .all()
+    )
+    event._attendee_count = len(attendees)
     
     return render_template(
         'events/view.html',
         title=event.name,
         event=event,
-        attendees=attendees
+        attendees=attendees,
+        recommendations=recommend_guests(current_user, event.id)
     )
 
 @events_bp.route('/<int:id>/edit', methods=['GET', 'POST'])
@@ -138,31 +162,39 @@ def delete(id):
     flash(f"Event '{name}' has been deleted.", 'success')
     return redirect(url_for('events.index'))
 
+@events_bp.route('/delete-range', methods=['GET', 'POST'])
+@login_required
+def delete_range():
+    if not current_user.is_admin:
+        abort(403)
+    
+    form = EventRangeDeleteForm()
+    
+    if form.validate_on_submit():
+        # Both dates are inclusive, like the event search
+        result = delete_events_between(form.date_from.data, form.date_to.data + timedelta(days=1))
+        
+        if result['success']:
+            flash(result['message'], 'success')
+            return redirect(url_for('events.index'))
+        flash(result['message'], 'danger')
+    
+    return render_template('events/delete_range.html', title='Delete Events by Date', form=form)
+
 @events_bp.route('/<int:id>/attendees/add', methods=['GET', 'POST'])
 @login_required
 def add_attendee(id):
     event = Event.query.get_or_404(id)
     form = AttendeeForm()
     
-    # Get current user's guests to populate the form choices
-    # This is likely the issue - the route isn't filtering guests by user_id
-    guests = Guest.query.filter_by(user_id=current_user.id).order_by(Guest.last_name, Guest.first_name).all()
-    
-    # Make sure we have guests before trying to build choices
-    if not guests:
+    # Make sure the user has guests before offering to add one
+    if db.session.query(Guest.id).filter_by(user_id=current_user.id).first() is None:
         flash("You need to add guests to your database before you can add them to events.", "warning")
         return redirect(url_for('guests.create'))
     
-    # Populate guest choices with proper formatting
-    form.guest_id.choices = [(g.id, f"{g.full_name} ({g.organization or 'No organization'})") for g in guests]
-    
     if form.validate_on_submit():
-        guest = Guest.query.get(form.guest_id.data)
-        
-        # Verify the guest belongs to the current user
-        if guest.user_id != current_user.id:
-            flash("You can only add your own guests to events.", "danger")
-            return redirect(url_for('events.view', id=event.id))
+        # The form has already checked the guest belongs to the current user
+        guest = form.guest
         
         # Check if already attending
         existing = EventAttendance.query.filter_by(
@@ -203,6 +235,142 @@ def remove_attendee(event_id, attendee_id):
     flash(f"{guest_name} has been removed from the attendee list.", 'success')
     return redirect(url_for('events.view', id=event_id))
 
+@events_bp.route('/<int:id>/attendees/bulk', methods=['POST'])
+@login_required
+def bulk_attendees(id):
+    """
+    Add, remove or check in many attendees at once.
+    
+    Accepts either a JSON body like {"action": "add", "guest_ids": [...]} or
+    the multi-select form on the event page. Actions are "add" (guest_ids),
+    and "remove", "attended" and "not_attended" (attendance_ids). JSON
+    clients send the CSRF token in the X-CSRFToken header.
+    """
+    event = Event.query.get_or_404(id)
+    
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        action = payload.get('action')
+        guest_ids = payload.get('guest_ids')
+        attendance_ids = payload.get('attendance_ids')
+        # Ignore anything that isn't a list of ids
+        guest_ids = guest_ids if isinstance(guest_ids, list) else []
+        attendance_ids = attendance_ids if isinstance(attendance_ids, list) else []
+    else:
+        action = request.form.get('action')
+        guest_ids = request.form.getlist('guest_ids')
+        attendance_ids = request.form.getlist('attendance_ids')
+    
+    if action == 'add':
+        result = add_attendees(event.id, guest_ids, current_user.id)
+    elif action == 'remove':
+        result = remove_attendances(event.id, attendance_ids)
+    elif action in ('attended', 'not_attended'):
+        result = mark_attended(event.id, attendance_ids, attended=action == 'attended')
+    else:
+        result = {'success': False, 'affected': 0, 'message': "Unknown bulk action."}
+    
+    if request.is_json:
+        return jsonify(result), 200 if result['success'] else 400
+    
+    flash(result['message'], 'success' if result['success'] else 'danger')
+    return redirect(url_for('events.view', id=event.id))
+
+@events_bp.route('/<int:id>/attendees/export', methods=['GET'])
+@login_required
+def export_attendees(id):
+    """Download the event's attendee list as CSV or XLSX."""
+    event = Event.query.get_or_404(id)
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        flash("Unsupported export format.", 'danger')
+        return redirect(url_for('events.view', id=event.id))
+    
+    # One joined query over just the exported columns, streamed from a
+    # server-side cursor in the same order as the attendee list
+    attendees = db.session.execute(
+        db.select(*ATTENDEE_EXPORT_LOAD_COLUMNS)
+        .select_from(EventAttendance)
+        .join(EventAttendance.guest)
+        .where(EventAttendance.event_id == event.id)
+        .order_by(Guest.last_name, Guest.first_name, EventAttendance.id)
+        .execution_options(yield_per=1000)
+    )
+    
+    if export_format == 'xlsx':
+        rows = iter_xlsx(attendees, ATTENDEE_EXPORT_COLUMNS, sheet_title='Attendees')
+    else:
+        rows = iter_csv(attendees, ATTENDEE_EXPORT_COLUMNS)
+    prefix = f"{secure_filename(event.name).lower() or 'event'}-attendees"
+    
+    return Response(
+        stream_with_context(rows),
+        mimetype=EXPORT_FORMATS[export_format][0],
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(prefix, export_format)}"'}
+    )
+
+@events_bp.route('/<int:id>/checkin', methods=['GET'])
+@login_required
+def checkin(id):
+    """Check-in desk for an event, meant for tablets at the door."""
+    event = Event.query.options(load_only(Event.id, Event.name, Event.date, Event.location)).get_or_404(id)
+    return render_template(
+        'events/checkin.html',
+        title=f"Check-in - {event.name}",
+        event=event,
+        checked_in=checked_in_count(event.id),
+        total=event.attendee_count
+    )
+
+@events_bp.route('/<int:id>/checkin/search', methods=['GET'])
+@login_required
+def checkin_search(id):
+    """Search the event's attendees by name or nickname prefix."""
+    return jsonify(search_checkin(id, request.args.get('q', '')))
+
+@events_bp.route('/<int:id>/checkin/<int:attendance_id>', methods=['POST'])
+@login_required
+def checkin_toggle(id, attendance_id):
+    """Check an attendee in or out; JSON body {"attended": true|false}, or empty to flip."""
+    payload = request.get_json(silent=True) or {}
+    attended = payload.get('attended')
+    
+    state = set_checked_in(id, attendance_id, None if attended is None else bool(attended))
+    if state is None:
+        return jsonify(success=False, message="Attendee not found for this event."), 404
+    
+    return jsonify(success=True, attendance_id=attendance_id, attended=state, checked_in=checked_in_count(id))
+
+def _flash_not_found(result):
+    """Display information about names not found by an import."""
+    if result['not_found'] > 0:
+        not_found_message = f"{result['not_found']} names were not found in your database: "
+        # Show up to 5 names, then summarize the rest
+        if len(result['not_found_names']) <= 5:
+            not_found_message += ", ".join(result['not_found_names'])
+        else:
+            not_found_message += ", ".join(result['not_found_names'][:5]) + f" and {len(result['not_found_names']) - 5} more"
+        flash(not_found_message, 'warning')
+
+@events_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def batch_import():
+    form = BatchAttendeeImportForm()
+    result = None
+    
+    if form.validate_on_submit():
+        result = process_batch_attendee_file(form.file.data, current_user.id)
+        
+        if result['success']:
+            flash(f"Added {result['added']} attendees to {len(result['events'])} events.", 'success')
+        else:
+            flash(f"Error importing attendees: {result.get('message', 'Unknown error')}", 'danger')
+            result = None
+    
+    return render_template('events/batch_import.html', title='Import Attendees for Several Events',
+                           form=form, result=result)
+
 @events_bp.route('/<int:id>/import', methods=['GET', 'POST'])
 @login_required
 def import_attendees(id):
@@ -228,16 +396,7 @@ def import_attendees(id):
                     message += f" {result['existing']} attendees were already on the list."
                 
                 flash(message, 'success')
-                
-                # Display information about names not found
-                if result['not_found'] > 0:
-                    not_found_message = f"{result['not_found']} names were not found in your database: "
-                    # Show up to 5 names, then summarize the rest
-                    if len(result['not_found_names']) <= 5:
-                        not_found_message += ", ".join(result['not_found_names'])
-                    else:
-                        not_found_message += ", ".join(result['not_found_names'][:5]) + f" and {len(result['not_found_names']) - 5} more"
-                    flash(not_found_message, 'warning')
+                _flash_not_found(result)
                 
                 return redirect(url_for('events.view', id=event.id))
             else:
@@ -245,4 +404,31 @@ def import_attendees(id):
         else:
             flash('Invalid file format. Please upload a CSV or Excel file.', 'danger')
     
-    return render_template('events/import.html', title=f"Import Attendees - {event.name}", event=event)
\ No newline at end of file
+    return render_template('events/import.html', title=f"Import Attendees - {event.name}", event=event,
+                           eventbrite_form=EventbriteImportForm())
+
+@events_bp.route('/<int:id>/eventbrite-sync', methods=['POST'])
+@login_required
+def eventbrite_sync(id):
+    event = Event.query.get_or_404(id)
+    form = EventbriteImportForm()
+    
+    if not form.validate_on_submit():
+        for errors in form.errors.values():
+            for error in errors:
+                flash(error, 'danger')
+        return redirect(url_for('events.import_attendees', id=event.id))
+    
+    result = sync_eventbrite_export(form.file.data, event, current_user.id)
+    
+    if not result['success']:
+        flash(f"Error syncing attendees: {result.get('message', 'Unknown error')}", 'danger')
+        return redirect(url_for('events.import_attendees', id=event.id))
+    
+    message = result['message']
+    if result['skipped'] > 0:
+        message += f" {result['skipped']} registrations were skipped."
+    flash(message, 'success')
+    _flash_not_found(result)
+    
+    return redirect(url_for('events.view', id=event.id))
\ No newline at end of file
@@ -1,60 +1,233 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 import os
 import uuid
 
-from app.models import db, Guest
+from sqlalchemy import func
+from sqlalchemy.orm import load_only, undefer
+
+from app.models import db, Guest, EventAttendance, GUEST_LIST_COLUMNS
 from app.forms.guests import GuestForm, GuestSearchForm
 from app.services.photo import save_photo, delete_photo
+from app.services.search import search_guests
+from app.services.pagination import keyset_paginate
+from app.services.donor_capacity import parse_donor_capacity
+from app.services.facets import GUEST_FACETS, guest_facet_counts, apply_guest_facets
+from app.services.exports import EXPORT_FORMATS, GUEST_EXPORT_LOAD_COLUMNS, iter_csv, iter_xlsx, export_filename
+from app.services.dedupe import DUPLICATE_REASONS, find_duplicate_groups, suggest_primary, merge_guests
+from app.services.import_service import GUEST_IMPORT_FIELDS
 
 guests_bp = Blueprint('guests', __name__, url_prefix='/guests')
 
-@guests_bp.route('/', methods=['GET'])
-@login_required
-def index():
-    form = GuestSearchForm(request.args)
-    page = request.args.get('page', 1, type=int)
+# Sort orders offered by the guest directory, mapped to their sort columns.
+# Each is backed by a (user_id, ..., id) composite index on Guest.
+GUEST_SORTS = {
+    'last_name': (Guest.last_name, Guest.first_name),
+    'organization': (Guest.organization,),
+    'email': (Guest.email,),
+    'donor_capacity': (Guest.donor_capacity_amount,),
+}
+
+# Number of values offered per facet in the directory filters
+FACET_CHOICES = 50
+
+# Duplicate groups shown per page of the duplicate review
+DUPLICATE_GROUPS_PER_PAGE = 25
+
+def _directory_query(form):
+    """
+    Build the guest directory query from the search and sort arguments.
     
+    Returns:
+        tuple: (query, sort keys for keyset_paginate, sort_by, sort_direction)
+    """
     # Filter guests by the current user
     query = Guest.query.filter_by(user_id=current_user.id)
     
     # Apply search filters if provided
+    rank = None
     if form.search.data:
-        search_term = f"%{form.search.data}%"
-        query = query.filter(
-            (Guest.first_name.ilike(search_term)) |
-            (Guest.last_name.ilike(search_term)) |
-            (Guest.email.ilike(search_term)) |
-            (Guest.organization.ilike(search_term)) |
-            (Guest.athena_id.ilike(search_term)) |
-            (Guest.nickname.ilike(search_term)) |
-            (Guest.prospect_manager.ilike(search_term))
-        )
+        query, rank = search_guests(query, form.search.data)
+    
+    query = apply_guest_facets(query, {name: getattr(form, name).data for name in GUEST_FACETS})
     
-    # Apply sorting
-    sort_by = request.args.get('sort_by', 'last_name')
-    sort_direction = request.args.get('sort_direction', 'asc')
+    # Donor capacity ranges seek on the (user_id, donor_capacity_amount) index
+    capacity_min = _parse_capacity(form.capacity_min.data)
+    if capacity_min is not None:
+        query = query.filter(Guest.donor_capacity_amount >= capacity_min)
+    capacity_max = _parse_capacity(form.capacity_max.data)
+    if capacity_max is not None:
+        query = query.filter(Guest.donor_capacity_amount <= capacity_max)
     
-    if sort_direction == 'desc':
-        query = query.order_by(getattr(Guest, sort_by).desc())
+    # Apply sorting, searches default to the most relevant matches first
+    default_sort = 'relevance' if rank is not None else 'last_name'
+    sort_by = request.args.get('sort_by', default_sort)
+    if sort_by not in GUEST_SORTS and not (sort_by == 'relevance' and rank is not None):
+        sort_by = default_sort
+    sort_direction = 'desc' if request.args.get('sort_direction') == 'desc' else 'asc'
+    
+    if sort_by == 'relevance':
+        keys = [(rank, False), (Guest.id, False)]
     else:
-        query = query.order_by(getattr(Guest, sort_by))
+        descending = sort_direction == 'desc'
+        keys = [(column, descending) for column in GUEST_SORTS[sort_by]] + [(Guest.id, descending)]
+    
+    return query, keys, sort_by, sort_direction
+
+def _parse_capacity(value):
+    return parse_donor_capacity(
+        value,
+        current_app.config.get('DONOR_CAPACITY_LABELS'),
+        current_app.config.get('DONOR_CAPACITY_RATINGS')
+    )
+
+def _filter_args():
+    """Search and filter arguments to carry over into sort, page and export links."""
+    names = ('search', *GUEST_FACETS, 'capacity_min', 'capacity_max')
+    return {name: request.args[name] for name in names if request.args.get(name)}
+
+@guests_bp.route('/', methods=['GET'])
+@login_required
+def index():
+    form = GuestSearchForm(request.args)
+    cursor = request.args.get('cursor')
     
-    # Paginate the results
-    pagination = query.paginate(page=page, per_page=20, error_out=False)
+    query, keys, sort_by, sort_direction = _directory_query(form)
+    query = query.options(load_only(*GUEST_LIST_COLUMNS, Guest.donor_capacity))
+    
+    # Paginate the results, the id tie-breaker keeps the sort key unique
+    pagination = keyset_paginate(query, keys, cursor=cursor, per_page=20, with_total=True)
     guests = pagination.items
     
+    # Offer the most common values of each facet, plus any selected one
+    facets = guest_facet_counts(current_user)
+    for name, label in GUEST_FACETS.items():
+        field = getattr(form, name)
+        values = facets[name][:FACET_CHOICES]
+        if field.data and field.data not in [value for value, _ in values]:
+            values = [(field.data, dict(facets[name]).get(field.data, 0))] + values
+        field.choices = [('', f"Any {label.lower()}")] + [(value, f"{value} ({count})") for value, count in values]
+    
     return render_template(
         'guests/index.html',
         title='Guest Directory',
         guests=guests,
         pagination=pagination,
         form=form,
+        facets=GUEST_FACETS,
+        filter_args=_filter_args(),
         sort_by=sort_by,
         sort_direction=sort_direction
     )
 
+@guests_bp.route('/export', methods=['GET'])
+@login_required
+def export():
+    """Download the filtered guest directory as CSV or XLSX."""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        flash("Unsupported export format.", 'danger')
+        return redirect(url_for('guests.index'))
+    
+    form = GuestSearchForm(request.args)
+    query, keys, _, _ = _directory_query(form)
+    
+    # Stream rows from a server-side cursor in the same order as the directory
+    query = (
+        query.options(load_only(*GUEST_EXPORT_LOAD_COLUMNS))
+        .order_by(*[column.desc() if descending else column.asc() for column, descending in keys])
+        .yield_per(1000)
+    )
+    
+    rows = iter_xlsx(query) if export_format == 'xlsx' else iter_csv(query)
+    mimetype = EXPORT_FORMATS[export_format][0]
+    
+    return Response(
+        stream_with_context(rows),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{export_filename("guests", export_format)}"'}
+    )
+
+@guests_bp.route('/autocomplete', methods=['GET'])
+@login_required
+def autocomplete():
+    """Return the current user's best matching guests as JSON for typeaheads."""
+    text = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 25)
+    
+    if not text:
+        return jsonify(results=[])
+    
+    # Prefix matches come straight from the full-text index
+    query = Guest.query.options(load_only(*GUEST_LIST_COLUMNS)).filter_by(user_id=current_user.id)
+    query, rank = search_guests(query, text)
+    query = query.order_by(rank, Guest.id) if rank is not None else query.order_by(Guest.last_name, Guest.first_name, Guest.id)
+    
+    results = [
+        {'id': guest.id, 'text': f"{guest.full_name} ({guest.organization or 'No organization'})"}
+        for guest in query.limit(limit)
+    ]
+    return jsonify(results=results)
+
+@guests_bp.route('/duplicates', methods=['GET'])
+@login_required
+def duplicates():
+    groups = find_duplicate_groups(current_user)
+    
+    page = max(request.args.get('page', 1, type=int), 1)
+    start = (page - 1) * DUPLICATE_GROUPS_PER_PAGE
+    shown = groups[start:start + DUPLICATE_GROUPS_PER_PAGE]
+    
+    # Load the guests of the whole page and their event counts in two queries
+    ids = [guest_id for group in shown for guest_id in group['ids']]
+    guests = {}
+    event_counts = {}
+    if ids:
+        columns = [getattr(Guest, field) for field in GUEST_IMPORT_FIELDS]
+        guests = {
+            guest.id: guest
+            for guest in Guest.query.options(load_only(*GUEST_LIST_COLUMNS, *columns))
+            .filter(Guest.user_id == current_user.id, Guest.id.in_(ids))
+        }
+        event_counts = dict(db.session.execute(
+            db.select(EventAttendance.guest_id, func.count())
+            .where(EventAttendance.guest_id.in_(ids))
+            .group_by(EventAttendance.guest_id)
+        ).all())
+    
+    duplicate_groups = []
+    for group in shown:
+        members = [guests[guest_id] for guest_id in group['ids'] if guest_id in guests]
+        if len(members) > 1:
+            duplicate_groups.append({
+                'guests': members,
+                'reasons': [DUPLICATE_REASONS[kind] for kind in group['reasons']],
+                'primary': suggest_primary(members)
+            })
+    
+    return render_template(
+        'guests/duplicates.html',
+        title='Duplicate Guests',
+        groups=duplicate_groups,
+        event_counts=event_counts,
+        total=len(groups),
+        page=page,
+        has_next=start + DUPLICATE_GROUPS_PER_PAGE < len(groups)
+    )
+
+@guests_bp.route('/duplicates/merge', methods=['POST'])
+@login_required
+def merge_duplicates():
+    result = merge_guests(
+        current_user.id,
+        request.form.get('primary_id', type=int),
+        request.form.getlist('guest_ids', type=int)
+    )
+    
+    flash(result['message'], 'success' if result['success'] else 'danger')
+    return redirect(url_for('guests.duplicates', page=request.form.get('page', 1, type=int)))
+
 @guests_bp.route('/create', methods=['GET', 'POST'])
 @login_required
 def create():
@@ -106,13 +279,13 @@ def create():
 @guests_bp.route('/<int:id>', methods=['GET'])
 @login_required
 def view(id):
-    guest = Guest.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    guest = Guest.query.options(undefer(Guest.bio), undefer(Guest.notes)).filter_by(id=id, user_id=current_user.id).first_or_404()
     return render_template('guests/view.html', title=guest.full_name, guest=guest)
 
 @guests_bp.route('/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit(id):
-    guest = Guest.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+    guest = Guest.query.options(undefer(Guest.bio), undefer(Guest.notes)).filter_by(id=id, user_id=current_user.id).first_or_404()
     form = GuestForm(obj=guest)
     
     if form.validate_on_submit():
@@ -141,13 +314,14 @@ def edit(id):
         guest.donor_capacity = form.donor_capacity.data
         guest.notes = form.notes.data
         
-        # Handle photo upload if new photo provided
+        # Handle photo upload if new photo provided. The new photo is saved
+        # before the old one is released so re-uploading the same image keeps
+        # its shared file alive.
         if form.photo.data:
-            if guest.photo_filename:
-                delete_photo(guest.photo_filename)
-            
             filename = save_photo(form.photo.data)
             if filename:
+                if guest.photo_filename:
+                    delete_photo(guest.photo_filename)
                 guest.photo_filename = filename
         
         db.session.commit()
@@ -163,7 +337,7 @@ def delete(id):
     guest = Guest.query.filter_by(id=id, user_id=current_user.id).first_or_404()
     name = guest.full_name
     
-    # Delete photo if exists
+    # Release the photo; the file itself is reclaimed by `flask photos gc`
     if guest.photo_filename:
         delete_photo(guest.photo_filename)
     
@@ -2,7 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 
 from app.models import db
-from app.services.import_service import process_guest_import_file
+from app.services.import_service import process_guest_import_file, process_photo_archive
 
 guests_import_bp = Blueprint('guests_import', __name__, url_prefix='/guests/import')
 
@@ -54,4 +54,42 @@ def import_guests():
         else:
             flash('Invalid file format. Please upload an Excel file.', 'danger')
     
-    return render_template('guests/import.html', title="Import Guests")
\ No newline at end of file
+    return render_template('guests/import.html', title="Import Guests")
+
+@guests_import_bp.route('/photos', methods=['GET', 'POST'])
+@login_required
+def import_photos():
+    result = None
+
+    if request.method == 'POST':
+        if 'file' not in request.files:
+            flash('No file part', 'danger')
+            return redirect(request.url)
+        
+        file = request.files['file']
+        if file.filename == '':
+            flash('No selected file', 'danger')
+            return redirect(request.url)
+        
+        if file.filename.lower().endswith('.zip'):
+            # Match and attach the photos in the archive
+            result = process_photo_archive(file, current_user.id)
+            
+            if result['success']:
+                message = f"Photo import summary: {result['matched']} of {result['total_images']} photos attached to guests"
+                flash(message, 'success')
+                
+                if result['failed_files']:
+                    flash(f"{len(result['failed_files'])} photos could not be read as images.", 'warning')
+                if result['oversized_files']:
+                    flash(f"{len(result['oversized_files'])} photos were too large to import.", 'warning')
+                
+                # Go straight back to the directory when everything matched
+                if not (result['unmatched_files'] or result['failed_files'] or result['oversized_files']):
+                    return redirect(url_for('guests.index'))
+            else:
+                flash(f"Error importing photos: {result.get('message', 'Unknown error')}", 'danger')
+        else:
+            flash('Invalid file format. Please upload a zip archive.', 'danger')
+    
+    return render_template('guests/import_photos.html', title="Import Guest Photos", result=result)
\ No newline at end of file
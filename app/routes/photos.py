@@ -0,0 +1,62 @@
+import os
+import re
+from flask import Blueprint, current_app, request, send_from_directory
+from flask_login import login_required
+
+from app.services.photo import WEBP_EXTENSION, webp_filename
+
+photos_bp = Blueprint('photos', __name__, url_prefix='/photos')
+
+# Content-addressed ("ab/cd/<sha256>.jpg") and legacy uuid4 filenames are never
+# reused for different content, so responses for them can be cached forever
+UNIQUE_PHOTO_NAME = re.compile(r'^(?:[0-9a-f]{2}/[0-9a-f]{2}/)?([0-9a-f]{64}|[0-9a-f]{32})\.(?:jpg|jpeg|png|webp)$')
+
+# One year, the conventional ceiling for immutable responses
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+def accepts_webp():
+    """Check whether the request's Accept header explicitly lists WebP."""
+    return any(mimetype == 'image/webp' and quality > 0 for mimetype, quality in request.accept_mimetypes)
+
+@photos_bp.route('/<path:filename>', methods=['GET'])
+@login_required
+def serve(filename):
+    match = UNIQUE_PHOTO_NAME.match(filename)
+
+    if match:
+        etag = match.group(1)
+        negotiable = not filename.endswith(WEBP_EXTENSION)
+
+        # Serve the smaller WebP derivative to browsers that explicitly accept
+        # it; a bare */* is also sent by clients that can't decode WebP
+        if negotiable and accepts_webp():
+            derivative = webp_filename(filename)
+            if os.path.exists(os.path.join(current_app.config['UPLOAD_PATH'], *derivative.split('/'))):
+                filename = derivative
+                etag = f"{etag}-webp"
+
+        # The digest (or uuid) already identifies the content, so it doubles as
+        # a strong ETag without hashing the file on every request
+        response = send_from_directory(
+            current_app.config['UPLOAD_PATH'],
+            filename,
+            etag=etag,
+            max_age=IMMUTABLE_MAX_AGE
+        )
+        response.cache_control.immutable = True
+
+        if negotiable:
+            response.vary.add('Accept')
+    else:
+        # Anything else, like the default avatar, may be replaced in place and
+        # has to be revalidated once it goes stale
+        response = send_from_directory(
+            current_app.config['UPLOAD_PATH'],
+            filename,
+            max_age=current_app.config['PHOTO_DEFAULT_MAX_AGE']
+        )
+
+    # Photos are only available to signed-in users, keep them out of shared caches
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
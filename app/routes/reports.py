@@ -1,18 +1,105 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, send_file
-from flask_login import login_required
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, send_file, stream_template
+from flask_login import login_required, current_user
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
 import os
 import tempfile
 
-from app.models import Event
+from app.models import db, Event, Guest, EventAttendance
+from app.forms.events import EventSearchForm
 from app.services.reports import generate_bio_sheet
+from app.services.analytics import engagement_report, refresh_engagement_summary
+from app.services.pagination import keyset_paginate
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/reports')
 
 @reports_bp.route('/', methods=['GET'])
 @login_required
 def index():
-    events = Event.query.order_by(Event.date.desc()).all()
-    return render_template('reports/index.html', title='Reports', events=events)
+    form = EventSearchForm(request.args)
+    cursor = request.args.get('cursor')
+    view = 'archive' if request.args.get('view') == 'archive' else 'upcoming'
+    year = request.args.get('year', type=int)
+    
+    # Events happening today still count as upcoming
+    today = datetime.combine(date.today(), time.min)
+    
+    # Only the columns the listing shows, the counts are added per page
+    query = Event.query.options(load_only(Event.id, Event.name, Event.date))
+    
+    # Upcoming events soonest first; the archive walks back from yesterday
+    if view == 'upcoming':
+        query = query.filter(Event.date >= today)
+        descending = False
+    else:
+        query = query.filter(Event.date < today)
+        if year:
+            query = query.filter(Event.date >= datetime(year, 1, 1), Event.date < datetime(year + 1, 1, 1))
+        descending = True
+    
+    # Date range filter, inclusive of the whole last day
+    if form.date_from.data:
+        query = query.filter(Event.date >= form.date_from.data)
+    if form.date_to.data:
+        query = query.filter(Event.date < form.date_to.data + timedelta(days=1))
+    
+    pagination = keyset_paginate(query, [(Event.date, descending), (Event.id, descending)], cursor=cursor, per_page=25)
+    events = Event.load_attendee_counts(pagination.items)
+    
+    # Offer one archive link per year back to the oldest event
+    years = []
+    if view == 'archive':
+        oldest = db.session.query(func.min(Event.date)).scalar()
+        if oldest and oldest < today:
+            years = list(range(today.year, oldest.year - 1, -1))
+    
+    return render_template(
+        'reports/index.html',
+        title='Reports',
+        events=events,
+        pagination=pagination,
+        form=form,
+        view=view,
+        year=year,
+        years=years
+    )
+
+@reports_bp.route('/engagement', methods=['GET'])
+@login_required
+def engagement():
+    report = engagement_report(current_user.id)
+    return render_template('reports/engagement.html', title='Engagement', report=report)
+
+@reports_bp.route('/engagement/refresh', methods=['POST'])
+@login_required
+def refresh_engagement():
+    try:
+        refreshed = refresh_engagement_summary()
+    except Exception as e:
+        flash(f"Error refreshing engagement: {str(e)}", 'danger')
+    else:
+        flash(f"Engagement refreshed for {refreshed} changed events.", 'success')
+    return redirect(url_for('reports.engagement'))
+
+@reports_bp.route('/checkin-sheet/<int:event_id>', methods=['GET'])
+@login_required
+def checkin_sheet(event_id):
+    """Printable sign-in sheet listing every attendee, without photos or bios."""
+    event = Event.query.get_or_404(event_id)
+    
+    # Just the printed columns, rendered while rows stream from the cursor
+    attendees = db.session.execute(
+        db.select(Guest.first_name, Guest.last_name, Guest.nickname, Guest.organization, EventAttendance.attended)
+        .select_from(EventAttendance)
+        .join(EventAttendance.guest)
+        .where(EventAttendance.event_id == event.id)
+        .order_by(Guest.last_name, Guest.first_name, EventAttendance.id)
+        .execution_options(yield_per=1000)
+    )
+    
+    return stream_template('reports/checkin_sheet.html', title=f"Check-in Sheet - {event.name}",
+                           event=event, attendees=attendees)
 
 @reports_bp.route('/bio-sheet/<int:event_id>', methods=['GET'])
 @login_required
@@ -0,0 +1,287 @@
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, case, func, insert, or_
+from sqlalchemy.orm import load_only
+
+from app.models import db, DataVersion, Event, EventAttendance, Guest, EngagementSummary, get_data_version
+from app.services.cache import VersionedCache
+
+# Donor capacity bands used to break engagement down, as [lower, upper) dollar
+# ranges over Guest.donor_capacity_amount. Unrated guests get their own band.
+CAPACITY_BAND_EDGES = [0, 25_000, 100_000, 1_000_000, np.inf]
+CAPACITY_BAND_LABELS = ['Under $25K', '$25K-$100K', '$100K-$1M', '$1M+']
+UNRATED_BAND = 'Unrated'
+
+# Events re-summarized per query while refreshing
+REFRESH_BATCH_SIZE = 500
+
+# Most engaged guests per user, cached on the global 'engagement' DataVersion
+# counter so repeat views don't go back to the attendance table
+_top_guest_cache = VersionedCache(max_entries=64)
+
+ATTENDANCE_COLUMNS = ['event_id', 'event_date', 'guest_id', 'user_id', 'prospect_manager',
+                      'donor_capacity_amount', 'attended']
+
+def load_attendance_frame(event_ids=None, user_id=None):
+    """
+    Pull the attendance x guest x event join into a DataFrame in one query.
+    
+    Args:
+        event_ids: Only include these events
+        user_id: Only include this user's guests
+        
+    Returns:
+        DataFrame with one row per attendance (see ATTENDANCE_COLUMNS)
+    """
+    statement = (
+        db.select(
+            EventAttendance.event_id, Event.date, EventAttendance.guest_id, Guest.user_id,
+            Guest.prospect_manager, Guest.donor_capacity_amount, EventAttendance.attended
+        )
+        .join(Guest, EventAttendance.guest_id == Guest.id)
+        .join(Event, EventAttendance.event_id == Event.id)
+    )
+    if event_ids is not None:
+        statement = statement.where(EventAttendance.event_id.in_(event_ids))
+    if user_id is not None:
+        statement = statement.where(Guest.user_id == user_id)
+    
+    frame = pd.DataFrame(db.session.execute(statement).all(), columns=ATTENDANCE_COLUMNS)
+    frame['attended'] = frame['attended'].fillna(False).astype(bool)
+    frame['event_date'] = pd.to_datetime(frame['event_date'])
+    return frame
+
+def capacity_bands(amounts):
+    """Map donor capacity amounts to their band labels, vectorized."""
+    bands = pd.cut(pd.to_numeric(amounts), CAPACITY_BAND_EDGES, labels=CAPACITY_BAND_LABELS, right=False)
+    return bands.astype(object).where(bands.notna(), UNRATED_BAND)
+
+def _rate(numerator, denominator):
+    """Elementwise numerator / denominator, 0 where the denominator is 0."""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+def summarize_attendance(frame):
+    """
+    Aggregate an attendance frame to EngagementSummary rows.
+    
+    Returns:
+        list: Dicts of EngagementSummary column values
+    """
+    if frame.empty:
+        return []
+    
+    frame = frame.assign(capacity_band=capacity_bands(frame['donor_capacity_amount']))
+    summary = (
+        frame.groupby(['event_id', 'user_id', 'prospect_manager', 'capacity_band'], dropna=False)
+        .agg(invited=('guest_id', 'size'), attended=('attended', 'sum'))
+        .reset_index()
+    )
+    summary = summary.astype(object).where(summary.notna(), None)
+    return [
+        {**record, 'invited': int(record['invited']), 'attended': int(record['attended'])}
+        for record in summary.to_dict('records')
+    ]
+
+def summary_is_stale():
+    """Return whether engagement changed since the summary was last refreshed."""
+    return get_data_version('engagement') != get_data_version('engagement_summary')
+
+def refresh_engagement_summary():
+    """
+    Re-summarize events whose attendance changed since their last refresh.
+    
+    Events are found by comparing Event.engagement_version with the version
+    they were last summarized at, so only changed events are read and the
+    cost of a refresh doesn't grow with the event history.
+    
+    Run from `flask analytics refresh` or the refresh button on the
+    engagement report rather than on every page view.
+    
+    Returns:
+        int: Number of events refreshed
+    """
+    # The global version is read first, so changes made while refreshing
+    # leave the summary marked stale
+    mark_refreshed = (
+        db.update(DataVersion)
+        .where(DataVersion.name == 'engagement_summary')
+        .values(version=get_data_version('engagement'))
+    )
+    stale = db.session.execute(
+        db.select(Event.id, Event.engagement_version).where(or_(
+            Event.summarized_version.is_(None),
+            Event.summarized_version != Event.engagement_version
+        ))
+    ).all()
+    if not stale:
+        db.session.execute(mark_refreshed)
+        db.session.commit()
+        return 0
+    
+    mark_summarized = (
+        db.update(Event.__table__)
+        .where(Event.__table__.c.id == bindparam('event_id'))
+        .values(summarized_version=bindparam('version'))
+    )
+    
+    try:
+        for start in range(0, len(stale), REFRESH_BATCH_SIZE):
+            batch = stale[start:start + REFRESH_BATCH_SIZE]
+            event_ids = [event_id for event_id, _ in batch]
+            
+            records = summarize_attendance(load_attendance_frame(event_ids=event_ids))
+            
+            db.session.execute(
+                db.delete(EngagementSummary)
+                .where(EngagementSummary.event_id.in_(event_ids))
+                .execution_options(synchronize_session=False)
+            )
+            if records:
+                db.session.execute(insert(EngagementSummary), records)
+            
+            # Record the version that was read before summarizing, so changes
+            # made meanwhile are picked up by the next refresh
+            db.session.execute(mark_summarized, [
+                {'event_id': event_id, 'version': version} for event_id, version in batch
+            ])
+        db.session.execute(mark_refreshed)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return len(stale)
+
+def _load_summary(user_id):
+    statement = (
+        db.select(
+            EngagementSummary.event_id, Event.name, Event.date, EngagementSummary.prospect_manager,
+            EngagementSummary.capacity_band, EngagementSummary.invited, EngagementSummary.attended
+        )
+        .join(Event, EngagementSummary.event_id == Event.id)
+        .where(EngagementSummary.user_id == user_id)
+    )
+    frame = pd.DataFrame(db.session.execute(statement).all(),
+                         columns=['event_id', 'name', 'date', 'prospect_manager', 'capacity_band', 'invited', 'attended'])
+    frame['date'] = pd.to_datetime(frame['date'])
+    frame['prospect_manager'] = frame['prospect_manager'].fillna('Unassigned')
+    return frame
+
+def _rollup(frame, column):
+    """Attendance by one segment column and year, plus an all-years total."""
+    years = frame['date'].dt.year
+    by_year = frame.groupby([frame[column], years])[['invited', 'attended']].sum()
+    by_year['rate'] = _rate(by_year['attended'], by_year['invited'])
+    
+    rates = by_year['rate'].unstack(fill_value=np.nan).sort_index(axis=1)
+    totals = frame.groupby(column)[['invited', 'attended']].sum()
+    totals['rate'] = _rate(totals['attended'], totals['invited'])
+    totals = totals.sort_values('attended', ascending=False)
+    
+    rows = []
+    for segment, total in totals.iterrows():
+        rows.append({
+            'segment': segment,
+            'invited': int(total['invited']),
+            'attended': int(total['attended']),
+            'rate': float(total['rate']),
+            'by_year': {int(year): (None if np.isnan(rate) else float(rate)) for year, rate in rates.loc[segment].items()}
+        })
+    return {'years': [int(year) for year in rates.columns], 'rows': rows}
+
+def top_guests(user_id, before, limit=10):
+    """
+    Find the user's guests checked in at the most events before a date.
+    
+    Counted by the database in one grouped query and cached per user on the
+    global 'engagement' counter, which moves on every attendance change.
+    
+    Args:
+        user_id: ID of the user whose guests to rank
+        before: Only count events before this datetime
+        limit: Number of guests to return
+        
+    Returns:
+        list: (guest_id, invited, attended) tuples, most attended first
+    """
+    version = (get_data_version('engagement'), before, limit)
+    rows = _top_guest_cache.get(user_id, version)
+    if rows is not None:
+        return rows
+    
+    invited = func.count(EventAttendance.id)
+    attended = func.sum(case((EventAttendance.attended.is_(True), 1), else_=0))
+    rows = [
+        (row.guest_id, int(row.invited), int(row.attended))
+        for row in db.session.execute(
+            db.select(EventAttendance.guest_id, invited.label('invited'), attended.label('attended'))
+            .join(Guest, EventAttendance.guest_id == Guest.id)
+            .join(Event, EventAttendance.event_id == Event.id)
+            .where(Guest.user_id == user_id, Event.date < before)
+            .group_by(EventAttendance.guest_id)
+            .having(attended > 0)
+            .order_by(attended.desc(), invited.desc(), EventAttendance.guest_id)
+            .limit(limit)
+        )
+    ]
+    _top_guest_cache.set(user_id, version, rows)
+    return rows
+
+def engagement_report(user_id, top=10, recent_events=20):
+    """
+    Build the engagement analytics for one user's guests.
+    
+    Segment and per-event aggregates are computed from the materialized
+    summary with vectorized pandas operations, as of its last refresh; the
+    report doesn't refresh it. Only events before today count, since
+    no-shows aren't known until an event is over.
+    
+    Args:
+        user_id: ID of the user whose guests to report on
+        top: Number of most engaged guests to list
+        recent_events: Number of recent events to show no-show rates for
+        
+    Returns:
+        dict: top_guests, events, by_manager, by_capacity, and whether the
+        summary is stale
+    """
+    today = datetime.combine(date.today(), time.min)
+    
+    summary = _load_summary(user_id)
+    summary = summary[summary['date'] < pd.Timestamp(today)]
+    
+    report = {'top_guests': [], 'events': [], 'by_manager': None, 'by_capacity': None,
+              'stale': summary_is_stale()}
+    if summary.empty:
+        return report
+    
+    # No-show rates per event
+    events = (
+        summary.groupby(['event_id', 'name', 'date'])[['invited', 'attended']].sum()
+        .reset_index()
+        .sort_values('date', ascending=False)
+        .head(recent_events)
+    )
+    events['no_show_rate'] = 1 - _rate(events['attended'], events['invited'])
+    report['events'] = events.to_dict('records')
+    
+    report['by_manager'] = _rollup(summary, 'prospect_manager')
+    report['by_capacity'] = _rollup(summary, 'capacity_band')
+    
+    guests = top_guests(user_id, today, top)
+    if guests:
+        names = {
+            guest.id: guest
+            for guest in Guest.query.filter(Guest.id.in_([guest_id for guest_id, _, _ in guests]))
+            .options(load_only(Guest.id, Guest.prefix, Guest.first_name, Guest.middle_name, Guest.last_name, Guest.organization))
+        }
+        report['top_guests'] = [
+            {'guest': names[guest_id], 'invited': invited, 'attended': attended, 'rate': attended / invited}
+            for guest_id, invited, attended in guests if guest_id in names
+        ]
+    
+    return report
\ No newline at end of file
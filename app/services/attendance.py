@@ -0,0 +1,167 @@
+from datetime import datetime
+from sqlalchemy import exists, false, insert, literal, select
+
+from app.models import db, Guest, EventAttendance, bump_attendance_version, bump_engagement_version
+
+# Largest number of ids accepted by one bulk operation
+BULK_ATTENDANCE_LIMIT = 1000
+
+def _clean_ids(ids):
+    """Deduplicate ids, dropping anything that isn't a positive integer."""
+    cleaned = set()
+    for value in ids or []:
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            cleaned.add(value)
+    return sorted(cleaned)
+
+def _bulk_result(ids):
+    result = {
+        'success': False,
+        'requested': len(ids),
+        'affected': 0,
+        'message': ''
+    }
+    if not ids:
+        result['message'] = "No attendees were selected."
+    elif len(ids) > BULK_ATTENDANCE_LIMIT:
+        result['message'] = f"At most {BULK_ATTENDANCE_LIMIT} attendees can be changed at once."
+    return result
+
+def add_attendees(event_id, guest_ids, user_id):
+    """
+    Add many guests to an event with a single INSERT ... SELECT.
+    
+    Guests that don't belong to the user or are already on the attendee
+    list are skipped by the statement itself, so no rows are read first.
+    
+    Args:
+        event_id: ID of the event
+        guest_ids: IDs of the guests to add
+        user_id: ID of the user the guests must belong to
+        
+    Returns:
+        dict: Result with the number of attendees added
+    """
+    guest_ids = _clean_ids(guest_ids)
+    result = _bulk_result(guest_ids)
+    if result['message']:
+        return result
+    
+    already_attending = exists().where(
+        EventAttendance.event_id == event_id,
+        EventAttendance.guest_id == Guest.id
+    )
+    guests = select(
+        Guest.id,
+        literal(event_id),
+        literal(datetime.utcnow()),
+        false()
+    ).where(
+        Guest.id.in_(guest_ids),
+        Guest.user_id == user_id,
+        ~already_attending
+    )
+    
+    try:
+        added = db.session.execute(
+            insert(EventAttendance).from_select(
+                ['guest_id', 'event_id', 'registration_date', 'attended'],
+                guests
+            )
+        ).rowcount
+        if added:
+            bump_attendance_version([event_id])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        result['message'] = f"Error adding attendees: {str(e)}"
+        return result
+    
+    result['success'] = True
+    result['affected'] = added
+    result['message'] = f"Added {added} attendees."
+    skipped = len(guest_ids) - added
+    if skipped:
+        result['message'] += f" {skipped} were already attending or not found."
+    return result
+
+def remove_attendances(event_id, attendance_ids):
+    """
+    Remove many attendances from an event with a single DELETE.
+    
+    Args:
+        event_id: ID of the event
+        attendance_ids: IDs of the EventAttendance rows to remove
+        
+    Returns:
+        dict: Result with the number of attendees removed
+    """
+    attendance_ids = _clean_ids(attendance_ids)
+    result = _bulk_result(attendance_ids)
+    if result['message']:
+        return result
+    
+    try:
+        removed = db.session.execute(
+            db.delete(EventAttendance)
+            .where(EventAttendance.event_id == event_id, EventAttendance.id.in_(attendance_ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if removed:
+            bump_attendance_version([event_id])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        result['message'] = f"Error removing attendees: {str(e)}"
+        return result
+    
+    result['success'] = True
+    result['affected'] = removed
+    result['message'] = f"Removed {removed} attendees."
+    return result
+
+def mark_attended(event_id, attendance_ids, attended=True):
+    """
+    Mark many attendances as attended (or not) with a single UPDATE.
+    
+    Args:
+        event_id: ID of the event
+        attendance_ids: IDs of the EventAttendance rows to update
+        attended: New value of EventAttendance.attended
+        
+    Returns:
+        dict: Result with the number of attendances changed
+    """
+    attendance_ids = _clean_ids(attendance_ids)
+    result = _bulk_result(attendance_ids)
+    if result['message']:
+        return result
+    
+    try:
+        updated = db.session.execute(
+            db.update(EventAttendance)
+            .where(
+                EventAttendance.event_id == event_id,
+                EventAttendance.id.in_(attendance_ids),
+                EventAttendance.attended.isnot(attended)
+            )
+            .values(attended=attended)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if updated:
+            bump_engagement_version([event_id])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        result['message'] = f"Error updating attendees: {str(e)}"
+        return result
+    
+    result['success'] = True
+    result['affected'] = updated
+    state = 'attended' if attended else 'not attended'
+    result['message'] = f"Marked {updated} attendees as {state}."
+    return result
@@ -0,0 +1,38 @@
+import threading
+from collections import OrderedDict
+
+class VersionedCache:
+    """
+    Small in-process LRU cache for values derived from versioned data.
+    
+    Every entry is stored with the version of the data it was computed from
+    and is only returned for that same version. Bumping the version in the
+    database therefore invalidates the entry in every worker process without
+    any of them having to be told.
+    """
+    
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, version):
+        """Return the cached value for key at version, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key, version, value):
+        """Cache value for key at version, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
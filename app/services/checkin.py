@@ -0,0 +1,172 @@
+from collections import defaultdict
+
+from app.models import db, Event, EventAttendance, Guest, bump_engagement_version
+from app.services.cache import VersionedCache
+from app.services.names import normalize_name
+
+# Matches returned by one check-in search
+CHECKIN_RESULTS = 20
+
+# Each worker keeps the index of the events it has served recently, keyed on
+# Event.attendance_version so any change to the attendee list rebuilds it
+_index_cache = VersionedCache(max_entries=32)
+
+class CheckinIndex:
+    """
+    Prefix index over the names of one event's attendees.
+    
+    Every normalized word of a guest's name and nickname is indexed under
+    all of its prefixes, so a search is a few dictionary lookups and a set
+    intersection however many people are on the list.
+    
+    Only the names are indexed. Whether someone has been checked in changes
+    constantly during an event and is read fresh from the database, so
+    check-ins never invalidate the index.
+    """
+    
+    def __init__(self, attendees):
+        """
+        Args:
+            attendees: Iterable of (attendance_id, guest_id, name, organization, nickname)
+        """
+        self.entries = {}
+        self.prefixes = defaultdict(set)
+        
+        for attendance_id, guest_id, name, organization, nickname in attendees:
+            self.entries[attendance_id] = {
+                'attendance_id': attendance_id,
+                'guest_id': guest_id,
+                'name': name,
+                'organization': organization,
+                'sort_key': normalize_name(name)
+            }
+            for word in set(normalize_name(f"{name} {nickname or ''}").split()):
+                for length in range(1, len(word) + 1):
+                    self.prefixes[word[:length]].add(attendance_id)
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def search(self, text, limit=CHECKIN_RESULTS):
+        """Return the entries matching every word of text as a prefix."""
+        terms = normalize_name(text).split()
+        if not terms:
+            return []
+        
+        # Intersect starting from the most selective term
+        matches = sorted((self.prefixes.get(term, set()) for term in terms), key=len)
+        ids = set(matches[0])
+        for other in matches[1:]:
+            ids &= other
+        
+        return sorted((self.entries[attendance_id] for attendance_id in ids), key=lambda entry: entry['sort_key'])[:limit]
+
+def _build_index(event_id):
+    rows = db.session.execute(
+        db.select(
+            EventAttendance.id, Guest.id, Guest.prefix, Guest.first_name, Guest.middle_name,
+            Guest.last_name, Guest.nickname, Guest.organization
+        )
+        .join(Guest, EventAttendance.guest_id == Guest.id)
+        .where(EventAttendance.event_id == event_id)
+    )
+    return CheckinIndex(
+        (attendance_id, guest_id,
+         ' '.join(part for part in (prefix, first, middle, last) if part),
+         organization, nickname)
+        for attendance_id, guest_id, prefix, first, middle, last, nickname, organization in rows
+    )
+
+def get_checkin_index(event_id, version):
+    """
+    Return the check-in index for an event, building it if needed.
+    
+    Args:
+        event_id: ID of the event
+        version: The event's current attendance_version
+    """
+    index = _index_cache.get(event_id, version)
+    if index is None:
+        index = _build_index(event_id)
+        _index_cache.set(event_id, version, index)
+    return index
+
+def checked_in_count(event_id):
+    """Count the attendees of an event who have been checked in."""
+    return db.session.execute(
+        db.select(db.func.count())
+        .select_from(EventAttendance)
+        .where(EventAttendance.event_id == event_id, EventAttendance.attended.is_(True))
+    ).scalar()
+
+def search_checkin(event_id, text):
+    """
+    Search an event's attendees for the check-in desk.
+    
+    Returns:
+        dict: Matching attendees with their current check-in state, plus the
+        number checked in so far and the size of the list
+    """
+    version = db.session.execute(
+        db.select(Event.attendance_version).where(Event.id == event_id)
+    ).scalar()
+    index = get_checkin_index(event_id, version)
+    matches = index.search(text)
+    
+    # Read check-in state fresh, other desks may have changed it
+    attended = {}
+    if matches:
+        attended = dict(db.session.execute(
+            db.select(EventAttendance.id, EventAttendance.attended)
+            .where(EventAttendance.id.in_([match['attendance_id'] for match in matches]))
+        ).all())
+    
+    return {
+        'results': [
+            {
+                'attendance_id': match['attendance_id'],
+                'guest_id': match['guest_id'],
+                'name': match['name'],
+                'organization': match['organization'],
+                'attended': bool(attended.get(match['attendance_id']))
+            }
+            for match in matches
+        ],
+        'checked_in': checked_in_count(event_id),
+        'total': len(index)
+    }
+
+def set_checked_in(event_id, attendance_id, attended=None):
+    """
+    Check one attendee in or out.
+    
+    Desks send the state they want rather than a toggle, so two desks
+    checking in the same person don't undo each other; a missing value
+    flips the current state.
+    
+    Args:
+        event_id: ID of the event
+        attendance_id: ID of the EventAttendance
+        attended: New state, or None to flip it
+        
+    Returns:
+        bool: The new state, or None if the attendance isn't part of the event
+    """
+    value = ~db.func.coalesce(EventAttendance.attended, False) if attended is None else bool(attended)
+    updated = db.session.execute(
+        db.update(EventAttendance)
+        .where(EventAttendance.id == attendance_id, EventAttendance.event_id == event_id)
+        .values(attended=value)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    
+    if not updated:
+        db.session.rollback()
+        return None
+    
+    state = db.session.execute(
+        db.select(EventAttendance.attended).where(EventAttendance.id == attendance_id)
+    ).scalar()
+    bump_engagement_version([event_id])
+    db.session.commit()
+    return bool(state)
@@ -0,0 +1,284 @@
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.orm import aliased, undefer
+
+from app.models import db, Guest, EventAttendance, bump_attendance_version
+from app.services.cache import VersionedCache
+from app.services.names import normalize_name, canonical_first_name
+from app.services.import_service import GUEST_IMPORT_FIELDS, fill_empty_fields
+from app.services.photo import delete_photo
+
+# What a group of duplicates was matched on, with labels for display
+DUPLICATE_REASONS = {
+    'name': 'Name',
+    'email': 'Email',
+    'athena_id': 'Athena ID',
+}
+
+# A name shared by more guests than this is too common to flag them all
+MAX_NAME_BLOCK = 25
+
+# Placeholder the guest import stores for an unknown donor capacity
+UNKNOWN_CAPACITY = 'TBD'
+
+# Duplicate groups are cached per user and keyed on User.guests_version, so
+# they are only recomputed after the user's guests change
+_duplicate_cache = VersionedCache()
+
+def blocking_keys(guest):
+    """
+    Return the (kind, key) pairs a guest is blocked on for duplicate detection.
+
+    Only guests sharing a key are ever compared, which keeps detection close
+    to linear in the number of guests. Names are keyed on the normalized last
+    name with the first name and nickname expanded through NICKNAMES, so
+    "Bob Smith" and "Robert Smith" share a key; emails and Athena IDs are
+    compared case-insensitively.
+    """
+    keys = []
+
+    last = normalize_name(guest.last_name)
+    if last:
+        firsts = {canonical_first_name(guest.first_name), canonical_first_name(guest.nickname)}
+        firsts.discard('')
+        keys.extend(('name', f"{first} {last}") for first in sorted(firsts))
+
+    if guest.email and guest.email.strip():
+        keys.append(('email', guest.email.strip().lower()))
+    if guest.athena_id and guest.athena_id.strip():
+        keys.append(('athena_id', guest.athena_id.strip().lower()))
+
+    return keys
+
+def find_duplicate_groups(user):
+    """
+    Find groups of the user's guests that look like the same person.
+
+    Guests are bucketed by their blocking keys in one pass and the buckets
+    are joined with a union-find, so guests linked through different keys
+    (one sharing a name, another an email) end up in the same group. The
+    Athena IDs of each group are tracked on its root, and a name match never
+    joins two groups whose Athena IDs differ.
+
+    Args:
+        user: User whose guests to check
+
+    Returns:
+        list: Groups as dicts with the sorted guest 'ids' and the 'reasons'
+        they were matched on, ordered by their oldest guest
+    """
+    groups = _duplicate_cache.get(user.id, user.guests_version)
+    if groups is not None:
+        return groups
+
+    blocks = {}
+    athena_ids = {}
+    rows = db.session.execute(
+        select(Guest.id, Guest.first_name, Guest.last_name, Guest.nickname, Guest.email, Guest.athena_id)
+        .where(Guest.user_id == user.id)
+        .order_by(Guest.id)
+        .execution_options(yield_per=1000)
+    )
+    for row in rows:
+        athena_ids[row.id] = (row.athena_id or '').strip().lower()
+        for key in blocking_keys(row):
+            blocks.setdefault(key, []).append(row.id)
+
+    parent = {}
+    # Athena IDs within each group, kept on the group's root
+    root_athena_ids = {guest_id: {athena_id} for guest_id, athena_id in athena_ids.items() if athena_id}
+
+    def find(guest_id):
+        root = guest_id
+        while parent.get(root, root) != root:
+            root = parent[root]
+        # Point the whole path at the root so later lookups are direct
+        while guest_id != root:
+            parent[guest_id], guest_id = root, parent[guest_id]
+        return root
+
+    def union(guest_id, other_id, kind):
+        root, other_root = find(guest_id), find(other_id)
+        if root == other_root:
+            return True
+        found = root_athena_ids.get(root, set()) | root_athena_ids.get(other_root, set())
+        # A shared name is not enough to join two different Athena IDs
+        if kind == 'name' and len(found) > 1:
+            return False
+        root, other_root = min(root, other_root), max(root, other_root)
+        parent[other_root] = root
+        if found:
+            root_athena_ids[root] = found
+        root_athena_ids.pop(other_root, None)
+        return True
+
+    # Email and Athena ID matches are joined first, so name matches are
+    # checked against the Athena IDs of complete groups
+    linked = []
+    for (kind, _), ids in sorted(blocks.items(), key=lambda block: block[0][0] == 'name'):
+        if len(ids) < 2 or (kind == 'name' and len(ids) > MAX_NAME_BLOCK):
+            continue
+
+        if kind == 'name':
+            # Join each guest to the oldest earlier group it does not conflict with
+            for i, other in enumerate(ids[1:], 1):
+                for root in dict.fromkeys(find(guest_id) for guest_id in ids[:i]):
+                    if union(root, other, kind):
+                        break
+        else:
+            for other in ids[1:]:
+                union(ids[0], other, kind)
+        linked.append((kind, ids))
+
+    members = {}
+    reasons = {}
+    for kind, ids in linked:
+        for root, count in Counter(find(guest_id) for guest_id in ids).items():
+            if count > 1:
+                reasons.setdefault(root, set()).add(kind)
+        for guest_id in ids:
+            members.setdefault(find(guest_id), set()).add(guest_id)
+
+    groups = [
+        {'ids': sorted(ids), 'reasons': [kind for kind in DUPLICATE_REASONS if kind in reasons.get(root, ())]}
+        for root, ids in members.items()
+        if len(ids) > 1
+    ]
+    groups.sort(key=lambda group: group['ids'][0])
+
+    _duplicate_cache.set(user.id, user.guests_version, groups)
+    return groups
+
+def suggest_primary(guests):
+    """Pick the guest to keep from a group: the most complete, then the oldest."""
+    def completeness(guest):
+        filled = sum(1 for field in GUEST_IMPORT_FIELDS
+                     if getattr(guest, field, None) not in (None, '', UNKNOWN_CAPACITY))
+        return (filled + bool(guest.photo_filename), -guest.id)
+
+    return max(guests, key=completeness)
+
+def merge_guests(user_id, primary_id, duplicate_ids):
+    """
+    Merge duplicate guests into the guest being kept.
+
+    Field values are consolidated with the guest import's fill-empty rules,
+    most recently updated duplicate first. Attendances are moved over with a
+    fixed number of set-based statements however many there are: check-ins
+    are carried over, rows for events the kept guest already attends (or
+    that another duplicate attends) are dropped to respect _guest_event_uc,
+    and the rest are re-pointed. The duplicates are then deleted.
+
+    Args:
+        user_id: ID of the user who owns the guests
+        primary_id: ID of the guest to keep
+        duplicate_ids: IDs of the guests to merge into it
+
+    Returns:
+        dict: Result with the number of guests merged and attendances moved
+    """
+    result = {
+        'success': False,
+        'merged': 0,
+        'moved': 0,
+        'message': ''
+    }
+
+    duplicate_ids = sorted(set(duplicate_ids) - {primary_id})
+    guests = (
+        Guest.query.options(undefer(Guest.bio), undefer(Guest.notes))
+        .filter(Guest.user_id == user_id, Guest.id.in_([primary_id] + duplicate_ids))
+        .all()
+    )
+    primary = next((guest for guest in guests if guest.id == primary_id), None)
+    duplicates = [guest for guest in guests if guest.id != primary_id]
+
+    if primary is None or not duplicates:
+        result['message'] = "Select the guest to keep and at least one duplicate."
+        return result
+
+    duplicate_ids = [guest.id for guest in duplicates]
+    group_ids = [primary.id] + duplicate_ids
+
+    try:
+        for duplicate in sorted(duplicates, key=lambda guest: guest.updated_at or datetime.min, reverse=True):
+            values = {field: getattr(duplicate, field) for field in GUEST_IMPORT_FIELDS}
+            overwrite = ()
+            # The import's placeholder capacity neither counts as a value nor
+            # keeps out a real one
+            if values['donor_capacity'] == UNKNOWN_CAPACITY:
+                del values['donor_capacity']
+            elif primary.donor_capacity == UNKNOWN_CAPACITY:
+                overwrite = ('donor_capacity',)
+            fill_empty_fields(primary, values, overwrite=overwrite)
+
+            # A photo moves over with its reference, any other is released
+            if duplicate.photo_filename and not primary.photo_filename:
+                primary.photo_filename = duplicate.photo_filename
+            elif duplicate.photo_filename:
+                delete_photo(duplicate.photo_filename)
+
+        event_ids = db.session.execute(
+            select(EventAttendance.event_id).where(EventAttendance.guest_id.in_(duplicate_ids)).distinct()
+        ).scalars().all()
+
+        other = aliased(EventAttendance)
+
+        # Check-ins of any guest in the group count for the one that is kept
+        db.session.execute(
+            update(EventAttendance)
+            .where(
+                EventAttendance.guest_id.in_(group_ids),
+                EventAttendance.attended.isnot(True),
+                exists().where(other.event_id == EventAttendance.event_id,
+                               other.guest_id.in_(group_ids),
+                               other.attended.is_(True))
+            )
+            .values(attended=True)
+            .execution_options(synchronize_session=False)
+        )
+        # Drop duplicate attendances of events the kept guest already attends...
+        db.session.execute(
+            delete(EventAttendance)
+            .where(
+                EventAttendance.guest_id.in_(duplicate_ids),
+                exists().where(other.event_id == EventAttendance.event_id, other.guest_id == primary.id)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        # ...and all but the first of several duplicates attending the same event
+        db.session.execute(
+            delete(EventAttendance)
+            .where(
+                EventAttendance.guest_id.in_(duplicate_ids),
+                exists().where(other.event_id == EventAttendance.event_id,
+                               other.guest_id.in_(duplicate_ids),
+                               other.id < EventAttendance.id)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        result['moved'] = db.session.execute(
+            update(EventAttendance)
+            .where(EventAttendance.guest_id.in_(duplicate_ids))
+            .values(guest_id=primary.id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        # Bulk statements bypass the session's change tracking
+        bump_attendance_version(event_ids)
+
+        # Only delete once nothing references the duplicates any more
+        for duplicate in duplicates:
+            db.session.delete(duplicate)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        result['message'] = f"Error merging guests: {str(e)}"
+        return result
+
+    result['success'] = True
+    result['merged'] = len(duplicates)
+    result['message'] = (f"Merged {len(duplicates)} duplicates into {primary.full_name} "
+                         f"and moved {result['moved']} event attendances.")
+    return result
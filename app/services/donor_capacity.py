@@ -0,0 +1,57 @@
+import re
+
+# Scale suffixes accepted after an amount, e.g. "$250K" or "1.5M"
+AMOUNT_MULTIPLIERS = {'k': 1_000, 'm': 1_000_000, 'b': 1_000_000_000}
+
+AMOUNT_PATTERN = re.compile(r'(\$)?\s*(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s*([kmb])?(?![a-z])', re.IGNORECASE)
+
+def _normalize_label(value):
+    return ' '.join(value.lower().replace('+', ' ').split())
+
+def parse_donor_capacity(value, labels=None, ratings=None):
+    """
+    Derive a dollar amount from a free-form donor capacity value.
+    
+    Values are matched in this order:
+    
+    1. Named labels such as "High" or "TBD" (case-insensitive, a trailing
+       "+" is ignored), mapped through ``labels``. A label mapped to None
+       is recognized but deliberately unrated.
+    2. Bare whole numbers like "5" that appear in ``ratings``, for rating
+       scales used by prospect research.
+    3. Amounts such as "$1M+", "250K", "$1,000,000" or "$100K-$250K"; for
+       ranges the lower bound is used.
+    
+    This has no dependency on the application so it can be used from
+    migrations as well as the model's write hooks.
+    
+    Args:
+        value: Donor capacity as entered
+        labels: Dict of lowercase label -> amount or None
+        ratings: Dict of rating number -> amount
+        
+    Returns:
+        int: Amount in whole dollars, or None if it couldn't be determined
+    """
+    if not value or not value.strip():
+        return None
+    
+    label = _normalize_label(value)
+    if labels and label in labels:
+        return labels[label]
+    
+    match = AMOUNT_PATTERN.search(value)
+    if not match:
+        return None
+    
+    dollar_sign, whole, fraction, suffix = match.groups()
+    
+    if not (dollar_sign or fraction or suffix) and ratings and label == whole:
+        rating = int(whole)
+        if rating in ratings:
+            return ratings[rating]
+    
+    amount = float(whole.replace(',', '') + (fraction or ''))
+    if suffix:
+        amount *= AMOUNT_MULTIPLIERS[suffix.lower()]
+    return int(amount)
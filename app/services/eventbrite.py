@@ -0,0 +1,318 @@
+import hashlib
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import load_only
+
+from app.models import db, Guest, EventAttendance, bump_attendance_version, bump_engagement_version
+from app.services.names import GuestNameIndex
+
+# Possible headers of each field in an Eventbrite attendee export, compared
+# case-insensitively; exact matches win over prefix matches
+EXPORT_COLUMNS = {
+    'order_id': ['order #', 'order no.', 'order no', 'order id', 'order number'],
+    'attendee_id': ['attendee #', 'attendee no.', 'attendee no', 'attendee id', 'attendee number'],
+    'event_id': ['event id'],
+    'first_name': ['first name'],
+    'last_name': ['last name'],
+    'email': ['email', 'email address'],
+    'status': ['attendee status', 'status'],
+}
+REQUIRED_COLUMNS = ('order_id', 'attendee_id', 'first_name', 'last_name')
+
+# Attendee statuses of registrations that no longer stand
+CANCELLED_STATUSES = {'not attending', 'cancelled', 'canceled', 'refunded', 'deleted', 'transferred'}
+CHECKED_IN_STATUSES = {'checked in', 'checked-in'}
+
+# Largest IN list sent in one lookup statement
+LOOKUP_BATCH = 500
+
+Registration = namedtuple('Registration', 'order_id first_name last_name email cancelled checked_in row_hash')
+
+def _find_column(columns, names):
+    headers = {col.lower().strip(): col for col in columns if isinstance(col, str)}
+    for name in names:
+        if name in headers:
+            return headers[name]
+    for name in names:
+        for header, col in headers.items():
+            if header.startswith(name):
+                return col
+    return None
+
+def _read_export(file):
+    # Everything is read as text so order and attendee numbers keep their form
+    for encoding in ('utf-8-sig', 'latin1'):
+        file.stream.seek(0)
+        try:
+            return pd.read_csv(file.stream, dtype=str, keep_default_na=False, encoding=encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("Could not decode the export with any supported encoding")
+
+def _row_hash(*values):
+    return hashlib.sha1('\x1f'.join(values).encode('utf-8')).hexdigest()
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_BATCH):
+        yield values[start:start + LOOKUP_BATCH]
+
+def _match_guests(registrations, user_id):
+    """
+    Match registrations to the user's guests by email, then by name.
+
+    Only guests sharing an email or last name with one of the registrations
+    are loaded, so the cost follows the number of registrations being
+    applied rather than the size of the guest directory.
+
+    Returns:
+        list: Guest id or None for each registration
+    """
+    emails = {r.email.lower() for r in registrations if r.email}
+    last_names = {r.last_name.lower() for r in registrations if r.last_name}
+
+    guests = {}
+    columns = load_only(Guest.id, Guest.first_name, Guest.middle_name, Guest.last_name, Guest.nickname, Guest.email)
+    for column, values in ((Guest.email, emails), (Guest.last_name, last_names)):
+        for chunk in _chunks(values):
+            for guest in (Guest.query.options(columns)
+                          .filter(Guest.user_id == user_id, func.lower(column).in_(chunk))):
+                guests[guest.id] = guest
+
+    index = GuestNameIndex(guests.values())
+    return [index.match(r.first_name, r.last_name, r.email) for r in registrations]
+
+def sync_eventbrite_export(file, event, user_id):
+    """
+    Reconcile an event's attendee list with an Eventbrite attendee export.
+
+    Registrations are keyed on Eventbrite's attendee numbers and fingerprinted,
+    so a repeated export only touches the rows that are new, changed or
+    cancelled since the last sync. Cancelled registrations remove their
+    attendance, as do synced attendees missing from an order the export
+    contains. Orders the export leaves out are never treated as cancelled, so
+    an export of just the orders since the watermark applies as a delta.
+    Attendances added by hand are linked to their registration instead of
+    being duplicated. The highest order number applied is kept on the event
+    as its sync watermark.
+
+    Args:
+        file: Uploaded CSV export
+        event: Event to sync
+        user_id: ID of the user whose guests registrations are matched to
+
+    Returns:
+        dict: Sync results with counts of added, updated and removed attendees
+    """
+    result = {
+        'success': False,
+        'added': 0,
+        'updated': 0,
+        'removed': 0,
+        'unchanged': 0,
+        'skipped': 0,
+        'new_orders': 0,
+        'not_found': 0,
+        'not_found_names': [],
+        'message': ''
+    }
+
+    try:
+        df = _read_export(file)
+    except Exception as e:
+        result['message'] = f"Error reading file: {str(e)}"
+        return result
+
+    columns = {field: _find_column(df.columns, names) for field, names in EXPORT_COLUMNS.items()}
+    missing = [field for field in REQUIRED_COLUMNS if columns[field] is None]
+    if missing:
+        result['message'] = (f"Required Eventbrite columns not found: {', '.join(missing)}. "
+                             f"Available columns: {list(df.columns)}")
+        return result
+
+    def values(field):
+        column = columns[field]
+        return df[column].str.strip().tolist() if column else [''] * len(df)
+
+    # Build the registrations of this event, keyed on the attendee number
+    registrations = {}
+    other_events = 0
+    for order, attendee, event_key, first, last, email, status in zip(
+        values('order_id'), values('attendee_id'), values('event_id'),
+        values('first_name'), values('last_name'), values('email'), values('status')
+    ):
+        if event.eventbrite_id and event_key and event_key != event.eventbrite_id:
+            other_events += 1
+            continue
+        try:
+            order_id = int(order.lstrip('#'))
+        except ValueError:
+            result['skipped'] += 1
+            continue
+        if not attendee:
+            result['skipped'] += 1
+            continue
+
+        status = status.lower()
+        registrations[attendee] = Registration(
+            order_id, first, last, email,
+            status in CANCELLED_STATUSES,
+            status in CHECKED_IN_STATUSES,
+            _row_hash(first, last, email.lower(), status)
+        )
+
+    if not registrations:
+        if other_events:
+            result['message'] = f"The export has no registrations for Eventbrite event {event.eventbrite_id}"
+        else:
+            result['message'] = "The export contains no registrations"
+        return result
+
+    try:
+        watermark = event.eventbrite_last_order or 0
+        export_orders = {r.order_id for r in registrations.values()}
+        export_last_order = max(export_orders)
+        # Orders at or below the watermark were applied by an earlier sync;
+        # an export without any is a delta holding new orders only
+        known_orders = [order for order in export_orders if order <= watermark]
+
+        # Only the registrations in the export are looked up, so a delta is
+        # reconciled without reading the rest of the event's attendees
+        synced = {}
+        for chunk in _chunks(registrations):
+            for row in db.session.execute(
+                select(EventAttendance.id, EventAttendance.guest_id, EventAttendance.attended,
+                       EventAttendance.eventbrite_attendee_id, EventAttendance.eventbrite_row_hash)
+                .where(EventAttendance.event_id == event.id, EventAttendance.eventbrite_attendee_id.in_(chunk))
+            ):
+                synced[row.eventbrite_attendee_id] = row
+
+        # Classify every registration against what was synced before
+        new = []
+        changed = []
+        removed_ids = []
+        for attendee_id, registration in registrations.items():
+            if registration.order_id > watermark:
+                result['new_orders'] += 1
+            current = synced.get(attendee_id)
+            if current is None:
+                if registration.cancelled:
+                    result['skipped'] += 1
+                else:
+                    new.append((attendee_id, registration))
+            elif registration.cancelled:
+                removed_ids.append(current.id)
+            elif current.eventbrite_row_hash == registration.row_hash:
+                result['unchanged'] += 1
+            else:
+                changed.append((current, registration))
+
+        # Eventbrite leaves cancelled tickets out of an order it exports, so a
+        # synced attendee missing from an order that is in this export is gone.
+        # Orders absent from the export are left alone.
+        for chunk in _chunks(known_orders):
+            for row in db.session.execute(
+                select(EventAttendance.id, EventAttendance.eventbrite_attendee_id)
+                .where(EventAttendance.event_id == event.id, EventAttendance.eventbrite_order_id.in_(chunk))
+            ):
+                if row.eventbrite_attendee_id not in registrations:
+                    removed_ids.append(row.id)
+
+        matches = _match_guests([r for _, r in new] + [r for _, r in changed], user_id)
+        new_guests = matches[:len(new)]
+        changed_guests = matches[len(new):]
+
+        # Attendances of the matched guests, which may have been added by hand
+        attending = {}
+        for chunk in _chunks({guest_id for guest_id in matches if guest_id}):
+            for row in db.session.execute(
+                select(EventAttendance.id, EventAttendance.guest_id, EventAttendance.eventbrite_attendee_id)
+                .where(EventAttendance.event_id == event.id, EventAttendance.guest_id.in_(chunk))
+            ):
+                attending[row.guest_id] = row
+        removed = set(removed_ids)
+        taken = {guest_id for guest_id, row in attending.items() if row.id not in removed}
+        linked = set()
+
+        inserts = []
+        updates = []
+        moved = False
+        now = datetime.utcnow()
+
+        for (attendee_id, registration), guest_id in zip(new, new_guests):
+            if guest_id is None:
+                result['not_found'] += 1
+                result['not_found_names'].append(f"{registration.first_name} {registration.last_name}")
+                continue
+
+            keys = {
+                'eventbrite_attendee_id': attendee_id,
+                'eventbrite_order_id': registration.order_id,
+                'eventbrite_row_hash': registration.row_hash
+            }
+            current = attending.get(guest_id)
+
+            if guest_id not in taken:
+                inserts.append(dict(keys, event_id=event.id, guest_id=guest_id,
+                                    registration_date=now, attended=registration.checked_in))
+                taken.add(guest_id)
+                result['added'] += 1
+            elif current is not None and current.eventbrite_attendee_id is None and current.id not in linked:
+                # Link an attendance added by hand to its registration
+                if registration.checked_in:
+                    keys['attended'] = True
+                updates.append(dict(keys, id=current.id))
+                linked.add(current.id)
+                result['updated'] += 1
+            else:
+                # A second ticket for a guest who is already on the list
+                result['skipped'] += 1
+
+        for (current, registration), guest_id in zip(changed, changed_guests):
+            changes = {
+                'id': current.id,
+                'eventbrite_order_id': registration.order_id,
+                'eventbrite_row_hash': registration.row_hash
+            }
+            if registration.checked_in and not current.attended:
+                changes['attended'] = True
+            # Follow a corrected name or email to another guest if it is free
+            if guest_id and guest_id != current.guest_id and guest_id not in taken:
+                changes['guest_id'] = guest_id
+                taken.add(guest_id)
+                moved = True
+            updates.append(changes)
+            result['updated'] += 1
+
+        for chunk in _chunks(removed):
+            result['removed'] += db.session.execute(
+                db.delete(EventAttendance)
+                .where(EventAttendance.id.in_(chunk))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        if inserts:
+            db.session.execute(insert(EventAttendance), inserts)
+        if updates:
+            db.session.execute(update(EventAttendance), updates)
+
+        # Bulk statements bypass the session's change tracking
+        if inserts or removed or moved:
+            bump_attendance_version([event.id])
+        elif updates:
+            bump_engagement_version([event.id])
+
+        event.eventbrite_last_order = max(watermark, export_last_order)
+        event.eventbrite_synced_at = now
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        result['message'] = f"Error syncing Eventbrite export: {str(e)}"
+        return result
+
+    result['success'] = True
+    result['message'] = (f"Eventbrite sync: {result['added']} added, {result['updated']} updated, "
+                         f"{result['removed']} removed, {result['unchanged']} unchanged.")
+    return result
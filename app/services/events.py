@@ -0,0 +1,49 @@
+from sqlalchemy import delete, func, select
+
+from app.models import db, Event, EventAttendance, bump_data_version
+
+def delete_events_between(start, end):
+    """
+    Delete every event dated within [start, end) in a couple of statements.
+
+    Attendances and engagement summaries are removed by the database through
+    ON DELETE CASCADE, so no rows are loaded into the session regardless of
+    how many events or attendees are involved.
+
+    Args:
+        start: Earliest event date to delete (inclusive)
+        end: Latest event date to delete (exclusive)
+
+    Returns:
+        dict: Result with the number of events and attendances deleted
+    """
+    result = {
+        'success': False,
+        'events': 0,
+        'attendances': 0,
+        'message': ''
+    }
+
+    in_range = (Event.date >= start) & (Event.date < end)
+
+    try:
+        result['attendances'] = db.session.execute(
+            select(func.count(EventAttendance.id))
+            .where(EventAttendance.event_id.in_(select(Event.id).where(in_range)))
+        ).scalar()
+        result['events'] = db.session.execute(
+            delete(Event).where(in_range).execution_options(synchronize_session=False)
+        ).rowcount
+        if result['events']:
+            # Bulk statements bypass the session's change tracking
+            bump_data_version('attendance', 'engagement')
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        result['message'] = f"Error deleting events: {str(e)}"
+        return result
+
+    result['success'] = True
+    result['message'] = (f"Deleted {result['events']} events "
+                         f"and {result['attendances']} attendance records.")
+    return result
\ No newline at end of file
@@ -0,0 +1,151 @@
+import csv
+import io
+import tempfile
+from datetime import date, datetime
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+from app.models import Guest, EventAttendance
+
+# Columns written by guest exports as (header, Guest attribute). The headers
+# are ones the guest importer recognizes, so an export can be edited and
+# imported again.
+GUEST_EXPORT_COLUMNS = (
+    ('Prefix', 'prefix'),
+    ('First Name', 'first_name'),
+    ('Middle Name', 'middle_name'),
+    ('Last Name', 'last_name'),
+    ('Nickname', 'nickname'),
+    ('Descriptor', 'descriptor'),
+    ('Email', 'email'),
+    ('Phone', 'phone'),
+    ('Organization', 'organization'),
+    ('Job Title', 'title'),
+    ('Athena ID', 'athena_id'),
+    ('Prospect Manager', 'prospect_manager'),
+    ('Donor Capacity', 'donor_capacity'),
+)
+
+# Model columns needed to write GUEST_EXPORT_COLUMNS, for use with load_only()
+GUEST_EXPORT_LOAD_COLUMNS = tuple(getattr(Guest, attribute) for _, attribute in GUEST_EXPORT_COLUMNS)
+
+# Columns written by attendee exports. The rows come from a joined column
+# query, where the attendance's notes are labelled apart from the guest's.
+ATTENDEE_EXPORT_COLUMNS = GUEST_EXPORT_COLUMNS + (
+    ('Attended', 'attended'),
+    ('Registration Date', 'registration_date'),
+    ('Attendance Notes', 'attendance_notes'),
+)
+
+# Columns to select for ATTENDEE_EXPORT_COLUMNS
+ATTENDEE_EXPORT_LOAD_COLUMNS = GUEST_EXPORT_LOAD_COLUMNS + (
+    EventAttendance.attended,
+    EventAttendance.registration_date,
+    EventAttendance.notes.label('attendance_notes'),
+)
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+# Rows buffered before a CSV chunk is sent, and bytes per chunk of XLSX output
+CSV_CHUNK_ROWS = 500
+XLSX_CHUNK_SIZE = 64 * 1024
+
+# Leading characters that make spreadsheet applications read a cell as a
+# formula. Such values are written with an apostrophe in front so opening an
+# export can't run anything a guest record was made to contain.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _reads_as_formula(value):
+    return isinstance(value, str) and value.startswith(FORMULA_PREFIXES)
+
+def escape_formula(value):
+    """Prefix text that would be read as a formula with an apostrophe."""
+    return "'" + value if _reads_as_formula(value) else value
+
+def unescape_formula(value):
+    """Undo escape_formula, so an edited export can be imported again."""
+    if isinstance(value, str) and value.startswith("'") and _reads_as_formula(value[1:]):
+        return value[1:]
+    return value
+
+def _row_values(item, columns):
+    return [getattr(item, attribute) for _, attribute in columns]
+
+def iter_csv(items, columns=GUEST_EXPORT_COLUMNS):
+    """
+    Stream items as CSV in chunks of encoded text.
+    
+    Args:
+        items: Iterable of objects, ideally a query using yield_per
+        columns: (header, attribute) pairs to write
+        
+    Yields:
+        str: CSV text, a few hundred rows at a time
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    # Byte order mark so Excel detects UTF-8 when opening the file directly
+    buffer.write('\ufeff')
+    writer.writerow([header for header, _ in columns])
+    
+    for count, item in enumerate(items, 1):
+        writer.writerow([escape_formula(value) for value in _row_values(item, columns)])
+        if count % CSV_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    yield buffer.getvalue()
+
+def _xlsx_value(sheet, value):
+    # Excel has no timezone support and openpyxl refuses aware datetimes
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    if _reads_as_formula(value):
+        # openpyxl writes text starting with '=' as a formula; store it as
+        # text with Excel's own hidden apostrophe prefix instead
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.data_type = 's'
+        cell.quotePrefix = True
+        return cell
+    return value
+
+def iter_xlsx(items, columns=GUEST_EXPORT_COLUMNS, sheet_title='Guests'):
+    """
+    Stream items as an XLSX workbook.
+    
+    The workbook is built in openpyxl's write-only mode, which writes rows
+    straight to a temporary file instead of keeping them in memory. The
+    finished file is then sent in fixed size chunks.
+    
+    Args:
+        items: Iterable of objects, ideally a query using yield_per
+        columns: (header, attribute) pairs to write
+        sheet_title: Name of the worksheet
+        
+    Yields:
+        bytes: Chunks of the XLSX file
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append([header for header, _ in columns])
+    
+    for item in items:
+        sheet.append([_xlsx_value(sheet, value) for value in _row_values(item, columns)])
+    
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(XLSX_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def export_filename(prefix, export_format):
+    """Build a dated download filename, e.g. guests-2024-05-01.csv."""
+    return f"{prefix}-{date.today().isoformat()}.{EXPORT_FORMATS[export_format][1]}"
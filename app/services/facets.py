@@ -0,0 +1,65 @@
+from sqlalchemy import func, literal, select, union_all
+
+from app.models import db, Guest
+from app.services.cache import VersionedCache
+
+# Guest columns offered as directory filters, with their labels
+GUEST_FACETS = {
+    'donor_capacity': 'Donor Capacity',
+    'prospect_manager': 'Prospect Manager',
+    'organization': 'Organization',
+}
+
+# Facet counts are cached per user and keyed on User.guests_version, which is
+# bumped whenever one of the user's guests changes
+_facet_cache = VersionedCache()
+
+def guest_facet_counts(user):
+    """
+    Count the current user's guests for every value of every facet.
+    
+    All facets are counted in a single UNION ALL of grouped aggregates, each
+    of which can be answered from a (user_id, column) index.
+    
+    Args:
+        user: User whose guests to count
+        
+    Returns:
+        dict: Facet name -> list of (value, count), most common first
+    """
+    counts = _facet_cache.get(user.id, user.guests_version)
+    if counts is not None:
+        return counts
+    
+    statement = union_all(*[
+        select(literal(name).label('facet'), getattr(Guest, name).label('value'), func.count().label('count'))
+        .where(Guest.user_id == user.id, getattr(Guest, name).isnot(None), getattr(Guest, name) != '')
+        .group_by(getattr(Guest, name))
+        for name in GUEST_FACETS
+    ])
+    
+    counts = {name: [] for name in GUEST_FACETS}
+    for facet, value, count in db.session.execute(statement):
+        counts[facet].append((value, count))
+    
+    for values in counts.values():
+        values.sort(key=lambda item: (-item[1], item[0]))
+    
+    _facet_cache.set(user.id, user.guests_version, counts)
+    return counts
+
+def apply_guest_facets(query, selected):
+    """
+    Restrict a Guest query to the selected facet values.
+    
+    Args:
+        query: Guest query to filter
+        selected: Dict of facet name -> selected value
+        
+    Returns:
+        Filtered query
+    """
+    for name, value in selected.items():
+        if name in GUEST_FACETS and value:
+            query = query.filter(getattr(Guest, name) == value)
+    return query
@@ -3,10 +3,99 @@ import pandas as pd
 import tempfile
 import os
 import datetime
+import zipfile
 
 from flask import current_app
-from sqlalchemy import func
-from app.models import db, Guest, User, EventAttendance
+from sqlalchemy import func, insert
+from sqlalchemy.orm import load_only, undefer
+from app.models import db, Guest, User, Event, EventAttendance, GUEST_LIST_COLUMNS, bump_attendance_version
+from app.services.exports import unescape_formula
+from app.services.names import normalize_name, guest_name_keys, GuestNameIndex
+from app.services.photo import image_pool, process_images, store_photo, delete_photo
+
+def _read_table(file, **options):
+    """
+    Read an uploaded Excel or CSV file into a DataFrame.
+    
+    CSV files are tried in several encodings and their delimiter is sniffed.
+    Cells our exports escaped against formula injection are unescaped.
+    Extra keyword arguments are passed on to the pandas reader.
+    """
+    suffix = os.path.splitext(file.filename)[1]
+    
+    # Save the uploaded file to a temporary location
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp:
+        file.save(temp.name)
+        temp_path = temp.name
+    
+    try:
+        # Read based on file type
+        if suffix.lower() in ['.xlsx', '.xls']:
+            return pd.read_excel(temp_path, engine='openpyxl', **options).map(unescape_formula)
+        
+        # Try multiple encodings for CSV
+        for encoding in ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']:
+            try:
+                df = pd.read_csv(temp_path, encoding=encoding, sep=None, engine='python', **options)
+                return df.map(unescape_formula)
+            except UnicodeDecodeError:
+                continue
+        
+        raise Exception("Could not decode the file with any supported encoding")
+    finally:
+        # Clean up the temporary file
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+# Optional guest fields read by the guest import
+GUEST_IMPORT_FIELDS = (
+    'email', 'prefix', 'middle_name', 'nickname', 'descriptor',
+    'phone', 'organization', 'title', 'athena_id',
+    'prospect_manager', 'donor_capacity', 'bio', 'notes'
+)
+
+# Fields an import updates even when the guest already has a value
+IMPORT_OVERWRITE_FIELDS = ('donor_capacity',)
+
+def fill_empty_fields(guest, values, overwrite=IMPORT_OVERWRITE_FIELDS):
+    """
+    Copy new information onto a guest without losing what it already has.
+    
+    A field is only filled in when the guest's value is empty, except for the
+    fields in overwrite, which take any non-empty value. Imports update
+    existing guests this way and duplicate merges use the same rules.
+    
+    Args:
+        guest: Guest to update
+        values: Dict of field name -> new value
+        overwrite: Fields to update even when the guest has a value
+        
+    Returns:
+        list: Names of the fields that were updated
+    """
+    updated_fields = []
+    
+    for field, value in values.items():
+        # Skip known non-string fields that shouldn't be compared this way
+        if field in ['created_at', 'updated_at', 'id', 'user_id']:
+            continue
+            
+        try:
+            existing_value = getattr(guest, field)
+            
+            # Safe comparison - handle all possible types
+            is_empty = (existing_value is None or 
+                       (isinstance(existing_value, str) and existing_value.strip() == '') or
+                       (isinstance(existing_value, (int, float)) and existing_value == 0))
+            
+            if value and (is_empty or field in overwrite):
+                setattr(guest, field, value)
+                updated_fields.append(field)
+        except (AttributeError, TypeError):
+            # Skip fields that can't be compared or don't exist
+            continue
+    
+    return updated_fields
 
 def process_guest_import_file(file, user_id):
     """
@@ -31,41 +120,12 @@ def process_guest_import_file(file, user_id):
     }
     
     try:
-        # Save the uploaded file to a temporary location
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp:
-            file.save(temp.name)
-            temp_path = temp.name
-        
         try:
-            # Read based on file type
-            file_ext = os.path.splitext(file.filename)[1].lower()
-            if file_ext in ['.xlsx', '.xls']:
-                df = pd.read_excel(temp_path, engine='openpyxl')
-            else:
-                # Try multiple encodings for CSV
-                encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-                df = None
-                
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(temp_path, encoding=encoding, sep=None, engine='python')
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                    
-                if df is None:
-                    raise Exception("Could not decode the file with any supported encoding")
-            
+            df = _read_table(file)
         except Exception as read_error:
             result['message'] = f"Error reading file: {str(read_error)}"
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
             return result
         
-        # Clean up the temporary file
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
-        
         # Check if dataframe is empty
         if df.empty:
             result['message'] = "The uploaded file contains no data"
@@ -176,7 +236,8 @@ def process_guest_import_file(file, user_id):
                 )
                 
             # Execute the query with the conditions
-            existing_guest = Guest.query.filter(
+            # Bio and notes are deferred by default but may be filled in below
+            existing_guest = Guest.query.options(undefer(Guest.bio), undefer(Guest.notes)).filter(
                 db.or_(*query_conditions)
             ).first()
             
@@ -184,13 +245,7 @@ def process_guest_import_file(file, user_id):
             guest_data = {}
             
             # Get all field values from the row
-            optional_fields = [
-                'email', 'prefix', 'middle_name', 'nickname', 'descriptor', 
-                'phone', 'organization', 'title', 'athena_id', 
-                'prospect_manager', 'donor_capacity', 'bio', 'notes'
-            ]
-            
-            for field in optional_fields:
+            for field in GUEST_IMPORT_FIELDS:
                 mapped_col = mapped_columns.get(field)
                 if mapped_col:
                     value = row.get(mapped_col)
@@ -225,39 +280,7 @@ def process_guest_import_file(file, user_id):
             
             if existing_guest:
                 # Update existing guest with any new information
-                updated = False
-                updated_fields = []
-                
-                # Check each field - only update if the field has a value and the existing field is empty
-                for field, value in guest_data.items():
-                    # Skip known non-string fields that shouldn't be compared this way
-                    if field in ['created_at', 'updated_at', 'id', 'user_id']:
-                        continue
-                        
-                    try:
-                        existing_value = getattr(existing_guest, field)
-                        
-                        # Safe comparison - handle all possible types
-                        is_empty = (existing_value is None or 
-                                   (isinstance(existing_value, str) and existing_value.strip() == '') or
-                                   (isinstance(existing_value, (int, float)) and existing_value == 0))
-                        
-                        # Extra handling for donor_capacity field
-                        if field == 'donor_capacity':
-                            # Always update donor_capacity if we have a value
-                            if value:
-                                setattr(existing_guest, field, value)
-                                updated = True
-                                updated_fields.append(field)
-                        elif value and is_empty:
-                            setattr(existing_guest, field, value)
-                            updated = True
-                            updated_fields.append(field)
-                    except (AttributeError, TypeError):
-                        # Skip fields that can't be compared or don't exist
-                        continue
-                
-                if updated:
+                if fill_empty_fields(existing_guest, guest_data):
                     result['updated'] += 1
                 else:
                     result['skipped'] += 1
@@ -301,41 +324,12 @@ def process_attendee_file(file, event_id):
     }
     
     try:
-        # Save the uploaded file to a temporary location
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp:
-            file.save(temp.name)
-            temp_path = temp.name
-        
         try:
-            # Read based on file type
-            file_ext = os.path.splitext(file.filename)[1].lower()
-            if file_ext in ['.xlsx', '.xls']:
-                df = pd.read_excel(temp_path, engine='openpyxl')
-            else:
-                # Try multiple encodings for CSV
-                encodings = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
-                df = None
-                
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(temp_path, encoding=encoding, sep=None, engine='python')
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                    
-                if df is None:
-                    raise Exception("Could not decode the file with any supported encoding")
-            
+            df = _read_table(file)
         except Exception as read_error:
             result['message'] = f"Error reading file: {str(read_error)}"
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
             return result
         
-        # Clean up the temporary file
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
-        
         # Check if dataframe is empty
         if df.empty:
             result['message'] = "The uploaded file contains no data"
@@ -405,4 +399,326 @@ def process_attendee_file(file, event_id):
     except Exception as e:
         db.session.rollback()
         result['message'] = str(e)
-        return result
\ No newline at end of file
+        return result
+
+# Headers that route a row of a batch attendee import to its event
+BATCH_EVENT_COLUMNS = {
+    'eventbrite_id': ['eventbrite id', 'eventbrite event id', 'event id'],
+    'event_name': ['event name', 'event', 'event title'],
+}
+
+def process_batch_attendee_file(file, user_id):
+    """
+    Import attendees for several events from one spreadsheet.
+    
+    Each row is routed to an event by an Eventbrite ID or event name column.
+    Names are resolved once against an index of all the user's guests, and
+    the attendances of every event are inserted in a single statement and
+    transaction.
+    
+    Args:
+        file: Uploaded Excel or CSV file
+        user_id: ID of the user whose guests are matched
+        
+    Returns:
+        dict: Import results with a summary per event
+    """
+    result = {
+        'success': False,
+        'total_rows': 0,
+        'added': 0,
+        'existing': 0,
+        'not_found': 0,
+        'events': [],
+        'unknown_events': {},
+        'message': ''
+    }
+    
+    try:
+        try:
+            # Read everything as text so numeric Eventbrite IDs keep their form
+            df = _read_table(file, dtype=str, keep_default_na=False)
+        except Exception as read_error:
+            result['message'] = f"Error reading file: {str(read_error)}"
+            return result
+        
+        if df.empty:
+            result['message'] = "The uploaded file contains no data"
+            return result
+        
+        headers = {col.lower().strip(): col for col in df.columns if isinstance(col, str)}
+        event_columns = {
+            field: next((headers[name] for name in names if name in headers), None)
+            for field, names in BATCH_EVENT_COLUMNS.items()
+        }
+        first_name_col = next((col for header, col in headers.items() if 'first' in header and 'name' in header), None)
+        last_name_col = next((col for header, col in headers.items() if 'last' in header and 'name' in header), None)
+        email_col = next((headers[name] for name in ('email', 'e-mail', 'email address') if name in headers), None)
+        
+        if not first_name_col or not last_name_col:
+            result['message'] = f"Required columns 'First Name' and 'Last Name' not found. Available columns: {list(headers.values())}"
+            return result
+        if not any(event_columns.values()):
+            result['message'] = "No 'Event Name' or 'Eventbrite ID' column found to route attendees to events"
+            return result
+        
+        def values(column):
+            return df[column].str.strip().tolist() if column else [''] * len(df)
+        
+        rows = [
+            row for row in zip(
+                values(event_columns['eventbrite_id']), values(event_columns['event_name']),
+                values(first_name_col), values(last_name_col), values(email_col)
+            )
+            if row[2] and row[3]
+        ]
+        result['total_rows'] = len(rows)
+        
+        # Resolve every event referenced by the file in one query
+        eventbrite_ids = {row[0] for row in rows if row[0]}
+        event_names = {row[1].lower() for row in rows if row[1]}
+        
+        events_by_eventbrite_id = {}
+        events_by_name = {}
+        if eventbrite_ids or event_names:
+            for event in Event.query.options(load_only(Event.id, Event.name, Event.eventbrite_id)).filter(
+                db.or_(Event.eventbrite_id.in_(eventbrite_ids), func.lower(Event.name).in_(event_names))
+            ):
+                if event.eventbrite_id:
+                    events_by_eventbrite_id[event.eventbrite_id] = event
+                events_by_name.setdefault(event.name.lower(), []).append(event)
+        
+        # Build the shared guest index once for all events
+        index = GuestNameIndex(
+            Guest.query.options(load_only(Guest.id, Guest.first_name, Guest.middle_name,
+                                          Guest.last_name, Guest.nickname, Guest.email))
+            .filter_by(user_id=user_id)
+        )
+        
+        summaries = {}
+        matched = []
+        for eventbrite_id, event_name, first_name, last_name, email in rows:
+            # Prefer the Eventbrite ID, falling back to the event name
+            event = events_by_eventbrite_id.get(eventbrite_id) if eventbrite_id else None
+            candidates = events_by_name.get(event_name.lower(), []) if event is None else []
+            if len(candidates) == 1:
+                event = candidates[0]
+            
+            if event is None:
+                label = event_name or (f"Eventbrite ID {eventbrite_id}" if eventbrite_id else '(no event)')
+                if len(candidates) > 1:
+                    # Events sharing a name can only be told apart by Eventbrite ID
+                    label += ' (several events have this name)'
+                result['unknown_events'][label] = result['unknown_events'].get(label, 0) + 1
+                continue
+            
+            summary = summaries.get(event.id)
+            if summary is None:
+                summary = summaries[event.id] = {
+                    'id': event.id,
+                    'name': event.name,
+                    'added': 0,
+                    'existing': 0,
+                    'not_found': 0,
+                    'not_found_names': []
+                }
+            
+            guest_id = index.match(first_name, last_name, email)
+            if guest_id is None:
+                summary['not_found'] += 1
+                summary['not_found_names'].append(f"{first_name} {last_name}")
+            else:
+                matched.append((event.id, guest_id))
+        
+        # Skip guests who are already attending
+        attending = set()
+        if summaries:
+            attending.update(db.session.execute(
+                db.select(EventAttendance.event_id, EventAttendance.guest_id)
+                .where(EventAttendance.event_id.in_(list(summaries)))
+            ).tuples())
+        
+        now = datetime.datetime.utcnow()
+        records = []
+        for event_id, guest_id in matched:
+            if (event_id, guest_id) in attending:
+                summaries[event_id]['existing'] += 1
+                continue
+            attending.add((event_id, guest_id))
+            records.append({'event_id': event_id, 'guest_id': guest_id,
+                            'registration_date': now, 'attended': False})
+            summaries[event_id]['added'] += 1
+        
+        if records:
+            db.session.execute(insert(EventAttendance), records)
+            # Bulk inserts bypass the session's change tracking
+            bump_attendance_version({record['event_id'] for record in records})
+        db.session.commit()
+        
+        result['events'] = sorted(summaries.values(), key=lambda summary: summary['name'].lower())
+        for field in ('added', 'existing', 'not_found'):
+            result[field] = sum(summary[field] for summary in result['events'])
+        result['success'] = True
+        return result
+        
+    except Exception as e:
+        db.session.rollback()
+        result['message'] = str(e)
+        return result
+
+def _read_archive_entry(archive, info, limit):
+    # The sizes in the zip headers can be forged, so never inflate past the limit
+    with archive.open(info) as entry:
+        data = entry.read(limit + 1)
+    return data if len(data) <= limit else None
+
+def _find_athena_id(tokens, guests_by_athena_id):
+    # IDs with punctuation such as "AB-1234" normalize to several tokens, so
+    # runs of consecutive tokens are tried, longest first
+    longest = max((key.count(' ') + 1 for key in guests_by_athena_id), default=0)
+    for length in range(min(longest, len(tokens)), 0, -1):
+        for start in range(len(tokens) - length + 1):
+            guest = guests_by_athena_id.get(' '.join(tokens[start:start + length]))
+            if guest is not None:
+                return guest
+    return None
+
+def process_photo_archive(file, user_id):
+    """
+    Attach photos from a zip archive to the matching guests.
+
+    Each image is matched to a guest by an Athena ID or a normalized name in
+    its filename (e.g. "12345.jpg", "Jane_Smith.png" or "smith-jane.jpg").
+    Matched images are read and resized in bounded batches in a process pool,
+    through the same pipeline as single uploads, and all guests are updated
+    in one transaction. Images larger than PHOTO_ARCHIVE_MAX_FILE_SIZE are
+    skipped, and archives expanding past PHOTO_ARCHIVE_MAX_TOTAL_SIZE are
+    rejected.
+
+    Args:
+        file: Uploaded zip file object
+        user_id: ID of the current user whose guests are matched
+
+    Returns:
+        dict: Import results with details about the import process
+    """
+    result = {
+        'success': False,
+        'matched': 0,
+        'total_images': 0,
+        'unmatched_files': [],
+        'failed_files': [],
+        'oversized_files': [],
+        'message': ''
+    }
+
+    max_file_size = current_app.config['PHOTO_ARCHIVE_MAX_FILE_SIZE']
+    max_total_size = current_app.config['PHOTO_ARCHIVE_MAX_TOTAL_SIZE']
+    batch_size = current_app.config['PHOTO_IMPORT_BATCH_SIZE']
+
+    try:
+        try:
+            archive = zipfile.ZipFile(file.stream)
+        except zipfile.BadZipFile:
+            result['message'] = "The uploaded file is not a valid zip archive"
+            return result
+
+        # Build lookup tables for the user's guests once
+        guests_by_athena_id = {}
+        guests_by_name = {}
+        ambiguous_names = set()
+
+        guests = Guest.query.options(load_only(*GUEST_LIST_COLUMNS, Guest.athena_id)).filter_by(user_id=user_id)
+        for guest in guests:
+            athena_key = normalize_name(guest.athena_id)
+            if athena_key:
+                guests_by_athena_id[athena_key] = guest
+            for key in guest_name_keys(guest):
+                if key in guests_by_name and guests_by_name[key] is not guest:
+                    ambiguous_names.add(key)
+                guests_by_name[key] = guest
+
+        allowed_extensions = current_app.config['UPLOAD_EXTENSIONS']
+        matches = []
+
+        for info in archive.infolist():
+            basename = os.path.basename(info.filename)
+
+            # Skip folders and the metadata files macOS adds to archives
+            if info.is_dir() or basename.startswith('.') or info.filename.startswith('__MACOSX/'):
+                continue
+
+            stem, ext = os.path.splitext(basename)
+            if ext.lower() not in allowed_extensions:
+                continue
+
+            result['total_images'] += 1
+
+            if info.file_size > max_file_size:
+                result['oversized_files'].append(info.filename)
+                continue
+
+            # Prefer an Athena ID anywhere in the filename, then the full name
+            tokens = normalize_name(stem).split()
+            guest = _find_athena_id(tokens, guests_by_athena_id)
+            if guest is None:
+                name_key = ' '.join(t for t in tokens if not t.isdigit())
+                if name_key not in ambiguous_names:
+                    guest = guests_by_name.get(name_key)
+
+            if guest is None:
+                result['unmatched_files'].append(info.filename)
+            else:
+                matches.append((info, guest))
+
+        if not matches:
+            result['message'] = "No photos in the archive matched a guest"
+            return result
+
+        total_size = sum(info.file_size for info, _ in matches)
+        if total_size > max_total_size:
+            result['message'] = (f"The matched photos expand to {total_size // 2**20} MB, more than the "
+                                 f"{max_total_size // 2**20} MB allowed per archive. Please split it up.")
+            return result
+
+        # Only one batch of images is held in memory at a time, and one
+        # process pool serves every batch
+        max_workers = current_app.config.get('PHOTO_IMPORT_WORKERS')
+        total_size = 0
+        with image_pool(len(matches), max_workers) as pool:
+            for start in range(0, len(matches), batch_size):
+                batch = []
+                for info, guest in matches[start:start + batch_size]:
+                    data = _read_archive_entry(archive, info, max_file_size)
+                    if data is None:
+                        result['oversized_files'].append(info.filename)
+                        continue
+                    total_size += len(data)
+                    if total_size > max_total_size:
+                        raise ValueError(f"The archive expands to more than the {max_total_size // 2**20} MB "
+                                         f"allowed per archive. Please split it up.")
+                    batch.append((info.filename, guest, data))
+
+                processed = process_images([data for _, _, data in batch], max_workers=max_workers, pool=pool)
+
+                for (name, guest, _), images in zip(batch, processed):
+                    if images is None:
+                        result['failed_files'].append(name)
+                        continue
+
+                    filename = store_photo(*images)
+                    if guest.photo_filename:
+                        delete_photo(guest.photo_filename)
+                    guest.photo_filename = filename
+                    result['matched'] += 1
+
+        # Commit all changes
+        db.session.commit()
+
+        result['success'] = True
+        return result
+
+    except Exception as e:
+        db.session.rollback()
+        result['message'] = str(e)
+        return result
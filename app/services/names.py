@@ -0,0 +1,92 @@
+import re
+import unicodedata
+
+def normalize_name(value):
+    """
+    Normalize a name (or any free text) for matching.
+
+    Accents and apostrophes are stripped, everything is lowercased and any
+    run of other punctuation, underscores or whitespace collapses to a single
+    space, so "José_O'Neil" and "jose oneil" compare equal.
+    """
+    if not value:
+        return ''
+
+    value = unicodedata.normalize('NFKD', str(value))
+    value = ''.join(c for c in value if not unicodedata.combining(c) and c not in "'\u2019")
+    return ' '.join(re.findall(r'[a-z0-9]+', value.lower()))
+
+# Common English diminutives and the given name they stand for, so that
+# "Bob Smith" and "Robert Smith" can be recognized as the same person
+NICKNAMES = {
+    'abby': 'abigail', 'al': 'albert', 'alex': 'alexander', 'andy': 'andrew', 'ben': 'benjamin',
+    'beth': 'elizabeth', 'betty': 'elizabeth', 'bill': 'william', 'billy': 'william', 'bob': 'robert',
+    'bobby': 'robert', 'cathy': 'catherine', 'chris': 'christopher', 'chuck': 'charles', 'dan': 'daniel',
+    'danny': 'daniel', 'dave': 'david', 'debbie': 'deborah', 'dick': 'richard', 'don': 'donald',
+    'ed': 'edward', 'eddie': 'edward', 'frank': 'francis', 'fred': 'frederick', 'greg': 'gregory',
+    'hank': 'henry', 'harry': 'henry', 'jack': 'john', 'jake': 'jacob', 'jim': 'james', 'jimmy': 'james',
+    'joe': 'joseph', 'johnny': 'john', 'jon': 'jonathan', 'kate': 'katherine', 'kathy': 'katherine',
+    'ken': 'kenneth', 'larry': 'lawrence', 'liz': 'elizabeth', 'maggie': 'margaret', 'matt': 'matthew',
+    'meg': 'margaret', 'mike': 'michael', 'nate': 'nathaniel', 'nick': 'nicholas', 'pat': 'patricia',
+    'peggy': 'margaret', 'pete': 'peter', 'phil': 'philip', 'ray': 'raymond', 'rich': 'richard',
+    'rick': 'richard', 'rob': 'robert', 'ron': 'ronald', 'sam': 'samuel', 'sandy': 'sandra',
+    'steve': 'stephen', 'sue': 'susan', 'ted': 'theodore', 'tom': 'thomas', 'tommy': 'thomas',
+    'tony': 'anthony', 'vicky': 'victoria', 'walt': 'walter', 'will': 'william',
+}
+
+def canonical_first_name(value):
+    """Normalize a first name and expand a known nickname, e.g. "Bob" -> "robert"."""
+    name = normalize_name(value)
+    return NICKNAMES.get(name, name)
+
+def guest_name_keys(guest):
+    """Return the normalized name keys a guest can be matched by."""
+    first = normalize_name(guest.first_name)
+    last = normalize_name(guest.last_name)
+    keys = {f"{first} {last}", f"{last} {first}"}
+
+    if guest.middle_name:
+        keys.add(f"{first} {normalize_name(guest.middle_name)} {last}")
+    if guest.nickname:
+        nickname = normalize_name(guest.nickname)
+        keys.add(f"{nickname} {last}")
+        keys.add(f"{last} {nickname}")
+
+    return keys
+
+class GuestNameIndex:
+    """
+    In-memory lookup of guests by email and normalized name.
+
+    Keys shared by more than one guest are remembered as ambiguous and never
+    match, so a row is only attributed to a guest it unambiguously names.
+    """
+
+    def __init__(self, guests=()):
+        self.by_email = {}
+        self.by_name = {}
+        self.ambiguous = set()
+        for guest in guests:
+            self.add(guest)
+
+    def _index(self, table, key, guest_id):
+        if key in table and table[key] != guest_id:
+            self.ambiguous.add(key)
+        table[key] = guest_id
+
+    def add(self, guest):
+        if guest.email and guest.email.strip():
+            self._index(self.by_email, guest.email.strip().lower(), guest.id)
+        for key in guest_name_keys(guest):
+            self._index(self.by_name, key, guest.id)
+
+    def match(self, first_name, last_name, email=None):
+        """Return the id of the guest with this email or name, or None."""
+        email = (email or '').strip().lower()
+        if email and email in self.by_email and email not in self.ambiguous:
+            return self.by_email[email]
+
+        name = f"{normalize_name(first_name)} {normalize_name(last_name)}"
+        if name in self.by_name and name not in self.ambiguous:
+            return self.by_name[name]
+        return None
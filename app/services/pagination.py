@@ -0,0 +1,223 @@
+import json
+import base64
+import binascii
+from datetime import date, datetime
+from sqlalchemy import and_, or_, false, func
+
+class KeysetPage:
+    """
+    One page of keyset (seek) paginated results.
+
+    Unlike OFFSET pagination the database never counts or skips the rows
+    before the page; it seeks straight to them through the sort key, so deep
+    pages cost the same as the first one.
+    """
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+def _coerce_value(expression, value):
+    """
+    Check a decoded cursor value against the type of its sort key.
+
+    Cursors come back from the client, so a tampered value must not reach
+    the query as a bind of the wrong type.
+
+    Raises:
+        ValueError: If the value doesn't fit the sort key
+    """
+    if value is None:
+        return None
+
+    try:
+        python_type = expression.type.python_type
+    except NotImplementedError:
+        # Untyped expressions, e.g. search ranks, only take plain scalars
+        python_type = None
+
+    if python_type is None:
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            return value
+    elif python_type is datetime:
+        if isinstance(value, datetime):
+            return value
+    elif python_type is date:
+        if isinstance(value, date) and not isinstance(value, datetime):
+            return value
+    elif python_type is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+    elif python_type is int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    elif isinstance(value, python_type):
+        return value
+
+    raise ValueError(f"Invalid cursor value for {expression}")
+
+def encode_cursor(values, direction, total=None):
+    """Pack sort key values into an opaque, URL-safe cursor string."""
+    payload = {'v': [_encode_value(v) for v in values], 'd': direction}
+    if total is not None:
+        payload['t'] = total
+    data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Unpack a cursor made by encode_cursor.
+
+    Returns:
+        tuple: (values, direction, total) or None if the cursor is invalid
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(data)
+        direction = payload['d']
+        values = [_decode_value(v) for v in payload['v']]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        return None
+
+    total = payload.get('t')
+    if direction not in ('next', 'prev') or not (total is None or type(total) is int):
+        return None
+    return values, direction, total
+
+# Databases whose default ordering treats NULL as larger than every value;
+# the others (SQLite, MySQL, SQL Server) treat it as smaller
+NULLS_HIGH_DIALECTS = {'postgresql', 'oracle'}
+
+def _order_clause(expression, descending):
+    # No NULLS FIRST/LAST: NULLs stay where the database puts them natively,
+    # so the ORDER BY matches a plain btree index scanned in either direction
+    return expression.desc() if descending else expression.asc()
+
+def _beyond(expression, value, descending, nulls_high):
+    """Rows strictly past value in sort order, with NULL placed as the database sorts it."""
+    # Whether NULLs come after every value in this direction
+    nulls_after = nulls_high != descending
+    if value is None:
+        return false() if nulls_after else expression.isnot(None)
+
+    past = expression < value if descending else expression > value
+    if nulls_after:
+        return or_(past, expression.is_(None))
+    return past
+
+def _equal(expression, value):
+    if value is None:
+        return expression.is_(None)
+    return expression == value
+
+def _seek_predicate(keys, values, nulls_high):
+    """Build the lexicographic "row comes after these key values" condition."""
+    (expression, descending), value = keys[-1], values[-1]
+    condition = _beyond(expression, value, descending, nulls_high)
+
+    for (expression, descending), value in zip(reversed(keys[:-1]), reversed(values[:-1])):
+        condition = or_(
+            _beyond(expression, value, descending, nulls_high),
+            and_(_equal(expression, value), condition)
+        )
+    return condition
+
+def keyset_paginate(query, keys, cursor=None, per_page=20, with_total=False):
+    """
+    Paginate a single-entity query on a unique sort key.
+
+    Args:
+        query: Query returning one entity per row, without ORDER BY
+        keys: List of (expression, descending) pairs that define the sort;
+            the last one must be unique (normally the primary key)
+        cursor: Cursor from a previous page, None for the first page
+        per_page: Number of items per page
+        with_total: Count the matching rows on the first page. The count is
+            carried along in the cursors, so later pages reuse it as an
+            approximation instead of counting again.
+
+    Returns:
+        KeysetPage
+    """
+    # A cursor that doesn't fit the sort keys starts over at the first page
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded and len(decoded[0]) != len(keys):
+        decoded = None
+    if decoded:
+        try:
+            decoded = ([_coerce_value(expression, value) for (expression, _), value in zip(keys, decoded[0])],
+                       *decoded[1:])
+        except ValueError:
+            decoded = None
+
+    total = None
+    if decoded:
+        values, direction, total = decoded
+    else:
+        values, direction = None, 'next'
+        if with_total:
+            # Count without the entity's columns rather than wrapping the
+            # full SELECT in a subquery the way Query.count() does
+            total = query.order_by(None).with_entities(func.count()).scalar()
+
+    # Paging backwards walks the same sort in reverse and flips the result
+    backwards = direction == 'prev'
+    seek_keys = [(expression, descending != backwards) for expression, descending in keys]
+
+    if values is not None:
+        nulls_high = query.session.get_bind().dialect.name in NULLS_HIGH_DIALECTS
+        query = query.filter(_seek_predicate(seek_keys, values, nulls_high))
+
+    rows = (
+        query.add_columns(*[expression.label(f'keyset_{i}') for i, (expression, _) in enumerate(keys)])
+        .order_by(*[_order_clause(expression, descending) for expression, descending in seek_keys])
+        .limit(per_page + 1)
+        .all()
+    )
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    items = [row[0] for row in rows]
+    row_keys = [list(row[1:]) for row in rows]
+
+    if backwards:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, values is not None
+
+    return KeysetPage(
+        items,
+        per_page,
+        next_cursor=encode_cursor(row_keys[-1], 'next', total) if has_next and rows else None,
+        prev_cursor=encode_cursor(row_keys[0], 'prev', total) if has_prev and rows else None,
+        total=total
+    )
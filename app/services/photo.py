@@ -1,61 +1,377 @@
 import os
-import uuid
-from werkzeug.utils import secure_filename
+import hashlib
+import time
+import shutil
+import tempfile
+from io import BytesIO
+from contextlib import nullcontext
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from flask import current_app
-from PIL import Image
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from PIL import Image, features
+
+from app.models import db, Guest, Photo
+
+# All processed photos are stored as JPEG regardless of the upload format.
+# JPEG stays the canonical copy (python-docx can only embed JPEG/PNG), with a
+# smaller WebP derivative stored next to it for browsers that accept it.
+PHOTO_EXTENSION = '.jpg'
+WEBP_EXTENSION = '.webp'
+
+# Files in the upload folder that are never garbage collected
+PROTECTED_PHOTOS = {'default.png'}
+
+def process_image(data, max_size=(300, 300)):
+    """
+    Resize raw image bytes into the stored photo formats.
+
+    This has no dependency on the application context so it can also be
+    run in worker processes.
+
+    Args:
+        data: Raw bytes of the uploaded image
+        max_size: Tuple for maximum dimensions (width, height)
+
+    Returns:
+        tuple: (JPEG bytes, WebP bytes or None if Pillow lacks WebP support)
+    """
+    img = Image.open(BytesIO(data))
+
+    # Convert to RGB if needed (in case of PNG with transparency)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Resize while maintaining aspect ratio
+    img.thumbnail(max_size, Image.LANCZOS)
+
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=85, optimize=True)
+
+    return output.getvalue(), encode_webp(img)
+
+def encode_webp(img):
+    """Encode a PIL image as WebP, or return None if WebP is unavailable."""
+    if not features.check('webp'):
+        return None
+
+    output = BytesIO()
+    img.save(output, format='WEBP', quality=80, method=4)
+    return output.getvalue()
+
+def webp_filename(filename):
+    """Return the filename of the WebP derivative of a stored photo."""
+    return os.path.splitext(filename)[0] + WEBP_EXTENSION
+
+def _process_image_or_none(data, max_size):
+    """Process an image, returning None instead of raising on bad input."""
+    try:
+        return process_image(data, max_size)
+    except Exception:
+        return None
+
+# Starting a pool costs more than resizing a handful of images
+MIN_POOL_IMAGES = 4
+
+def image_pool(count, max_workers=None):
+    """
+    Start a process pool for resizing count images, to be shared by several
+    process_images calls, e.g. one per batch of a large import.
+
+    Returns:
+        A ProcessPoolExecutor context manager, or a null context yielding
+        None when there are too few images to be worth starting one
+    """
+    if count < MIN_POOL_IMAGES:
+        return nullcontext()
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+def process_images(images, max_size=(300, 300), max_workers=None, pool=None):
+    """
+    Run many raw images through process_image using a process pool.
+
+    Args:
+        images: List of raw image bytes
+        max_size: Tuple for maximum dimensions (width, height)
+        max_workers: Pool size, defaults to the number of CPUs
+        pool: Optional running executor (see image_pool) to use instead of
+            starting a new pool
+
+    Returns:
+        list: (JPEG, WebP) tuples from process_image in input order, None
+        for images that could not be decoded
+    """
+    worker = partial(_process_image_or_none, max_size=max_size)
+    chunksize = max(1, len(images) // ((max_workers or os.cpu_count() or 1) * 4))
+
+    if pool is not None:
+        return list(pool.map(worker, images, chunksize=chunksize))
+
+    if len(images) < MIN_POOL_IMAGES:
+        return [worker(data) for data in images]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(worker, images, chunksize=chunksize))
+
+def content_filename(data):
+    """
+    Build the content-addressed filename for processed JPEG bytes.
+
+    Files are sharded two levels deep by the leading hex digits of their
+    SHA-256 digest, e.g. ``ab/cd/abcd...ef.jpg``, so no single directory
+    grows beyond a few hundred entries.
+
+    Returns:
+        tuple: (digest, relative filename)
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    return digest, f"{digest[:2]}/{digest[2:4]}/{digest}{PHOTO_EXTENSION}"
+
+def photo_path(filename):
+    """Return the absolute path of a stored photo."""
+    return os.path.join(current_app.config['UPLOAD_PATH'], *filename.split('/'))
+
+def _write_file(filepath, data):
+    """Atomically write a file so readers never see a partial photo."""
+    directory = os.path.dirname(filepath)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp:
+            temp.write(data)
+        os.replace(temp_path, filepath)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def store_photo(data, webp_data=None):
+    """
+    Store processed photo bytes and take a reference to them.
+
+    Identical content is written only once; later uploads of the same image
+    just increment the reference count. The reference is added to the current
+    database session, so the caller is responsible for committing it.
+
+    Args:
+        data: Processed JPEG bytes (see process_image)
+        webp_data: Optional WebP derivative of the same image
+
+    Returns:
+        Relative filename of the stored photo
+    """
+    digest, filename = content_filename(data)
+    filepath = photo_path(filename)
+
+    if os.path.exists(filepath):
+        # Refresh the timestamp so the garbage collector's grace period
+        # protects a file that is being referenced again
+        os.utime(filepath)
+    else:
+        _write_file(filepath, data)
+
+    if webp_data:
+        webp_path = photo_path(webp_filename(filename))
+        if os.path.exists(webp_path):
+            os.utime(webp_path)
+        else:
+            _write_file(webp_path, webp_data)
+
+    _add_photo_reference(digest, filename, len(data))
+    return filename
+
+# Dialects whose INSERT supports ON CONFLICT ... DO UPDATE
+UPSERT_INSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+def _add_photo_reference(digest, filename, size):
+    """
+    Create the Photo row for new content or increment its reference count.
+
+    Two requests uploading the same new image at once must not both try to
+    insert it, so this is a single upsert where the database supports one
+    and otherwise an insert that falls back to the increment when it loses
+    the race.
+    """
+    photos = Photo.__table__
+    values = {'digest': digest, 'filename': filename, 'size': size, 'ref_count': 1}
+    increment = db.update(photos).where(photos.c.digest == digest).values(ref_count=photos.c.ref_count + 1)
+
+    upsert_insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if upsert_insert is not None:
+        db.session.execute(upsert_insert(photos).values(**values).on_conflict_do_update(
+            index_elements=[photos.c.digest],
+            set_={'ref_count': photos.c.ref_count + 1}
+        ))
+        return
+
+    if db.session.execute(increment).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(photos).values(**values))
+    except IntegrityError:
+        db.session.execute(increment)
 
 def save_photo(photo_file, max_size=(300, 300)):
     """
     Save and process a photo upload.
-    
+
     Args:
         photo_file: FileStorage object from form
         max_size: Tuple for maximum dimensions (width, height)
-        
+
     Returns:
         Filename of saved photo or None if saving failed
     """
     if not photo_file:
         return None
-    
-    # Create a unique filename
-    filename = secure_filename(photo_file.filename)
-    name, ext = os.path.splitext(filename)
-    unique_filename = f"{uuid.uuid4().hex}{ext}"
-    
-    # Get the upload path
-    upload_path = current_app.config['UPLOAD_PATH']
-    filepath = os.path.join(upload_path, unique_filename)
-    
+
     try:
-        # Save and process the image
-        img = Image.open(photo_file)
-        
-        # Convert to RGB if needed (in case of PNG with transparency)
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Resize while maintaining aspect ratio
-        img.thumbnail(max_size, Image.LANCZOS)
-        
-        # Save the processed image
-        img.save(filepath, quality=85, optimize=True)
-        return unique_filename
+        data, webp_data = process_image(photo_file.read(), max_size)
+        return store_photo(data, webp_data)
     except Exception as e:
         current_app.logger.error(f"Error saving photo: {str(e)}")
         return None
 
 def delete_photo(filename):
-    """Delete a photo by filename."""
+    """
+    Release a reference to a photo by filename.
+
+    Files are never removed here; once nothing references a photo any more
+    it is reclaimed by collect_orphaned_photos. This keeps file deletion off
+    the request path and means a rolled back transaction can't lose a photo
+    that is still in use.
+    """
     if not filename:
         return False
-    
-    filepath = os.path.join(current_app.config['UPLOAD_PATH'], filename)
-    
+
     try:
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        photo = Photo.query.filter_by(filename=filename).first()
+        if photo:
+            photo.ref_count = Photo.ref_count - 1
         return True
     except Exception as e:
         current_app.logger.error(f"Error deleting photo: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def _iter_photo_files(directory, prefix=''):
+    """Recursively yield (relative filename, DirEntry) for every stored file."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_photo_files(entry.path, f"{prefix}{entry.name}/")
+            elif entry.is_file(follow_symlinks=False):
+                yield f"{prefix}{entry.name}", entry
+
+def collect_orphaned_photos(grace_period=24 * 60 * 60, quarantine_path=None, dry_run=False):
+    """
+    Remove photo files that no guest references.
+
+    The referenced filenames are streamed from the database into a set and the
+    upload folder is streamed from disk, so the whole pass is linear in the
+    number of guests plus the number of files. Files modified within the
+    grace period are kept, which covers uploads whose transaction has not
+    committed yet.
+
+    Args:
+        grace_period: Minimum age in seconds before an orphan is collected
+        quarantine_path: Move orphans into this folder instead of deleting them
+        dry_run: Only report what would be collected
+
+    Returns:
+        dict: Counts of scanned files, collected orphans and bytes reclaimed
+    """
+    result = {
+        'scanned': 0,
+        'orphaned': 0,
+        'kept_recent': 0,
+        'bytes_reclaimed': 0,
+        'errors': []
+    }
+
+    upload_path = current_app.config['UPLOAD_PATH']
+    cutoff = time.time() - grace_period
+
+    referenced = set(db.session.execute(
+        db.select(Guest.photo_filename)
+        .where(Guest.photo_filename.isnot(None))
+        .execution_options(yield_per=1000)
+    ).scalars())
+
+    # WebP derivatives live as long as the photo they were made from
+    referenced.update([webp_filename(filename) for filename in referenced])
+
+    collected = []
+
+    for filename, entry in _iter_photo_files(upload_path):
+        result['scanned'] += 1
+
+        if filename in referenced or filename in PROTECTED_PHOTOS:
+            continue
+
+        stat = entry.stat(follow_symlinks=False)
+        if stat.st_mtime > cutoff:
+            result['kept_recent'] += 1
+            continue
+
+        result['orphaned'] += 1
+        result['bytes_reclaimed'] += stat.st_size
+
+        if dry_run:
+            continue
+
+        try:
+            if quarantine_path:
+                target = os.path.join(quarantine_path, *filename.split('/'))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(entry.path, target)
+            else:
+                os.remove(entry.path)
+            collected.append(filename)
+        except OSError as e:
+            result['errors'].append(f"{filename}: {str(e)}")
+
+    # Drop the reference rows of collected files so a later upload of the same
+    # image writes it again
+    for start in range(0, len(collected), 500):
+        Photo.query.filter(Photo.filename.in_(collected[start:start + 500])).delete(synchronize_session=False)
+    db.session.commit()
+
+    return result
+
+def generate_missing_webp():
+    """
+    Create WebP derivatives for referenced photos that don't have one yet,
+    such as photos stored before derivatives were introduced.
+
+    Returns:
+        int: Number of derivatives written
+    """
+    if not features.check('webp'):
+        return 0
+
+    written = 0
+    filenames = db.session.execute(
+        db.select(Guest.photo_filename)
+        .where(Guest.photo_filename.isnot(None))
+        .distinct()
+        .execution_options(yield_per=1000)
+    ).scalars()
+
+    for filename in filenames:
+        source_path = photo_path(filename)
+        target_path = photo_path(webp_filename(filename))
+        if os.path.exists(target_path) or not os.path.exists(source_path):
+            continue
+
+        try:
+            with Image.open(source_path) as img:
+                _write_file(target_path, encode_webp(img.convert('RGB')))
+            written += 1
+        except Exception as e:
+            current_app.logger.error(f"Error creating WebP derivative for {filename}: {str(e)}")
+
+    return written
\ No newline at end of file
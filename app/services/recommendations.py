@@ -0,0 +1,140 @@
+import numpy as np
+from sqlalchemy.orm import load_only
+
+from app.models import db, EventAttendance, Guest, get_data_version
+from app.services.cache import VersionedCache
+
+# Suggestions shown per list
+RECOMMENDATION_LIMIT = 10
+
+# One attendance matrix per user, rebuilt when any attendee list or the
+# user's guest list changes; attendee list changes are seen through the
+# global 'attendance' DataVersion counter
+_matrix_cache = VersionedCache(max_entries=64)
+
+class AttendanceMatrix:
+    """
+    Sparse guest x event attendance matrix for one user's guests.
+    
+    The matrix is stored in coordinate form as two parallel index arrays, one
+    entry per attendance, so scoring a seed set is a couple of bincounts over
+    those arrays rather than a loop over guests or events.
+    """
+    
+    def __init__(self, guest_ids, event_ids):
+        """
+        Args:
+            guest_ids: Guest id of every attendance
+            event_ids: Event id of every attendance, parallel to guest_ids
+        """
+        self.guest_ids, self.guest_idx = np.unique(np.asarray(guest_ids, dtype=np.int64), return_inverse=True)
+        self.event_ids, self.event_idx = np.unique(np.asarray(event_ids, dtype=np.int64), return_inverse=True)
+        self.event_sizes = np.bincount(self.event_idx, minlength=len(self.event_ids))
+        self.guest_degrees = np.bincount(self.guest_idx, minlength=len(self.guest_ids))
+        self._results = {}
+    
+    def _top(self, scores, candidates, limit):
+        indices = np.flatnonzero(candidates)
+        order = indices[np.argsort(-scores[indices], kind='stable')][:limit]
+        return order[scores[order] > 0]
+    
+    def recommend(self, event_id, limit=RECOMMENDATION_LIMIT):
+        """
+        Score every guest against the attendees of one event.
+        
+        Returns:
+            dict: 'co_attendees', guests who most often attend alongside the
+            event's attendees, weighting small events above large ones; and
+            'similar', guests whose attendance history is most similar
+            (cosine) to the attendees' combined history. Both lists are
+            (guest_id, score, shared_events) tuples and leave out guests
+            already on the event.
+        """
+        if event_id in self._results:
+            return self._results[event_id]
+        
+        result = {'co_attendees': [], 'similar': []}
+        column = np.searchsorted(self.event_ids, event_id)
+        if column == len(self.event_ids) or self.event_ids[column] != event_id:
+            self._results[event_id] = result
+            return result
+        
+        # The seed set is everyone on this event's list
+        seeds = np.zeros(len(self.guest_ids), dtype=bool)
+        seeds[self.guest_idx[self.event_idx == column]] = True
+        
+        # How many seeds attended each event, excluding this one
+        seeds_per_event = np.bincount(self.event_idx[seeds[self.guest_idx]], minlength=len(self.event_ids)).astype(float)
+        seeds_per_event[column] = 0
+        
+        # Row sums of the matrix weighted by seeds per event: shared events,
+        # and the same with each event discounted by its size
+        per_entry = seeds_per_event[self.event_idx]
+        overlap = np.bincount(self.guest_idx, weights=per_entry, minlength=len(self.guest_ids))
+        weighted = np.bincount(self.guest_idx, weights=per_entry / self.event_sizes[self.event_idx], minlength=len(self.guest_ids))
+        shared = np.bincount(self.guest_idx, weights=(per_entry > 0), minlength=len(self.guest_ids))
+        
+        norm = np.sqrt(self.guest_degrees) * np.linalg.norm(seeds_per_event)
+        similarity = np.divide(overlap, norm, out=np.zeros_like(overlap), where=norm > 0)
+        
+        candidates = ~seeds & (shared > 0)
+        co_attendees = self._top(weighted, candidates, limit)
+        
+        # Don't repeat the co-attendees in the similar list
+        candidates[co_attendees] = False
+        similar = self._top(similarity, candidates, limit)
+        
+        result = {
+            'co_attendees': [(int(self.guest_ids[i]), float(weighted[i]), int(shared[i])) for i in co_attendees],
+            'similar': [(int(self.guest_ids[i]), float(similarity[i]), int(shared[i])) for i in similar],
+        }
+        self._results[event_id] = result
+        return result
+
+def get_attendance_matrix(user):
+    """Return the attendance matrix of a user's guests, building it if needed."""
+    version = (user.guests_version, get_data_version('attendance'))
+    matrix = _matrix_cache.get(user.id, version)
+    if matrix is None:
+        rows = db.session.execute(
+            db.select(EventAttendance.guest_id, EventAttendance.event_id)
+            .join(Guest, EventAttendance.guest_id == Guest.id)
+            .where(Guest.user_id == user.id)
+        ).all()
+        matrix = AttendanceMatrix([row[0] for row in rows], [row[1] for row in rows])
+        _matrix_cache.set(user.id, version, matrix)
+    return matrix
+
+def recommend_guests(user, event_id, limit=RECOMMENDATION_LIMIT):
+    """
+    Suggest guests to invite to an event based on who its attendees
+    usually attend with.
+    
+    Args:
+        user: User whose guests to suggest
+        event_id: ID of the event
+        limit: Suggestions per list
+        
+    Returns:
+        dict: 'co_attendees' and 'similar', lists of dicts with the guest,
+        its score and the number of events shared with the attendees
+    """
+    scores = get_attendance_matrix(user).recommend(event_id, limit)
+    
+    guest_ids = [guest_id for key in scores for guest_id, _, _ in scores[key]]
+    guests = {}
+    if guest_ids:
+        guests = {
+            guest.id: guest
+            for guest in Guest.query.options(
+                load_only(Guest.id, Guest.prefix, Guest.first_name, Guest.middle_name, Guest.last_name, Guest.organization)
+            ).filter(Guest.id.in_(guest_ids))
+        }
+    
+    return {
+        key: [
+            {'guest': guests[guest_id], 'score': score, 'shared_events': shared}
+            for guest_id, score, shared in scores[key] if guest_id in guests
+        ]
+        for key in scores
+    }
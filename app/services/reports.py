@@ -6,6 +6,7 @@ from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from PIL import Image
+from sqlalchemy.orm import contains_eager
 import io
 import tempfile
 
@@ -23,7 +24,13 @@ def generate_bio_sheet(event_id):
     """
     # Get the event and attendees (sorted by last name)
     event = Event.query.get_or_404(event_id)
-    attendances = event.attendances.join(Guest).order_by(Guest.last_name, Guest.first_name).all()
+    # Load the guests with the attendances, opting in to the deferred bio
+    attendances = (
+        event.attendances.join(EventAttendance.guest)
+        .options(contains_eager(EventAttendance.guest).undefer(Guest.bio))
+        .order_by(Guest.last_name, Guest.first_name)
+        .all()
+    )
     
     # Create a new document
     doc = Document()
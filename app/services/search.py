@@ -0,0 +1,65 @@
+import re
+from sqlalchemy import func, literal_column, select, table, column, or_
+
+from app.models import db, Guest, GUEST_SEARCH_DOCUMENT
+
+guest_fts = table('guest_fts', column('rowid'))
+
+def search_terms(text):
+    """Split free text into the word tokens used for prefix matching."""
+    return re.findall(r'\w+', (text or '').lower())
+
+def search_guests(query, text):
+    """
+    Restrict a Guest query to full-text matches of the given search text.
+
+    Every word in the text is matched as a prefix, so "jan smi" finds
+    "Jane Smith". The backend is picked by database dialect: an FTS5 table on
+    SQLite, a GIN-indexed tsvector on PostgreSQL, and plain ILIKE scans on
+    anything else.
+
+    Args:
+        query: Guest query to filter
+        text: Search text as entered by the user
+
+    Returns:
+        tuple: (filtered query, rank expression where lower is more relevant,
+        or None if the backend can't rank)
+    """
+    terms = search_terms(text)
+    if not terms:
+        return query, None
+
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        matches = select(
+            guest_fts.c.rowid.label('guest_id'),
+            func.bm25(literal_column('guest_fts')).label('rank')
+        ).where(
+            literal_column('guest_fts').op('MATCH')(' '.join(f'"{term}"*' for term in terms))
+        ).subquery()
+
+        query = query.join(matches, matches.c.guest_id == Guest.id)
+        return query, matches.c.rank
+
+    if dialect == 'postgresql':
+        document = literal_column(GUEST_SEARCH_DOCUMENT)
+        ts_query = func.to_tsquery(literal_column("'simple'::regconfig"), ' & '.join(f'{term}:*' for term in terms))
+
+        query = query.filter(document.op('@@')(ts_query))
+        return query, -func.ts_rank(document, ts_query)
+
+    # No full-text support, fall back to matching each word anywhere
+    for term in terms:
+        pattern = f"%{term}%"
+        query = query.filter(or_(
+            Guest.first_name.ilike(pattern),
+            Guest.last_name.ilike(pattern),
+            Guest.email.ilike(pattern),
+            Guest.organization.ilike(pattern),
+            Guest.athena_id.ilike(pattern),
+            Guest.nickname.ilike(pattern),
+            Guest.prospect_manager.ilike(pattern)
+        ))
+    return query, None
@@ -0,0 +1,55 @@
+"""cascade attendance deletes
+
+Revision ID: 2c6f8e1a9b47
+Revises: b83f1e6a4d25
+Create Date: 2026-10-19 18:12:37.284519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c6f8e1a9b47'
+down_revision = 'b83f1e6a4d25'
+branch_labels = None
+depends_on = None
+
+# SQLite foreign keys are unnamed; batch mode names them by this convention
+# when it reflects the table so they can be dropped
+naming_convention = {
+    "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
+}
+
+FOREIGN_KEYS = [
+    ('event_attendance', 'guest_id', 'guest'),
+    ('event_attendance', 'event_id', 'event'),
+    ('engagement_summary', 'event_id', 'event'),
+]
+
+
+def _replace_foreign_keys(ondelete):
+    inspector = sa.inspect(op.get_bind())
+
+    for table in ('event_attendance', 'engagement_summary'):
+        existing = {
+            tuple(fk['constrained_columns']): fk['name']
+            for fk in inspector.get_foreign_keys(table)
+        }
+
+        with op.batch_alter_table(table, naming_convention=naming_convention) as batch_op:
+            for fk_table, column, referred in FOREIGN_KEYS:
+                if fk_table != table:
+                    continue
+                name = existing.get((column,)) or f'fk_{table}_{column}_{referred}'
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(f'{table}_{column}_fkey', referred, [column], ['id'],
+                                            ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _replace_foreign_keys(None)
@@ -0,0 +1,32 @@
+"""add engagement data versions
+
+Revision ID: 6a2d9e4f1b38
+Revises: 4e8b1c7a2d93
+Create Date: 2026-10-19 21:38:15.907264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a2d9e4f1b38'
+down_revision = '4e8b1c7a2d93'
+branch_labels = None
+depends_on = None
+
+data_version = sa.table('data_version',
+    sa.column('name', sa.String),
+    sa.column('version', sa.Integer)
+)
+
+
+def upgrade():
+    op.bulk_insert(data_version, [
+        {'name': 'engagement', 'version': 0},
+        {'name': 'engagement_summary', 'version': 0},
+    ])
+
+
+def downgrade():
+    op.execute(data_version.delete().where(data_version.c.name.in_(['engagement', 'engagement_summary'])))
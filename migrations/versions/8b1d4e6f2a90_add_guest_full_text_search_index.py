@@ -0,0 +1,70 @@
+"""add guest full-text search index
+
+Revision ID: 8b1d4e6f2a90
+Revises: 3f9c2a7d1e4b
+Create Date: 2026-10-19 11:40:07.552819
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1d4e6f2a90'
+down_revision = '3f9c2a7d1e4b'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ('first_name', 'last_name', 'nickname', 'email',
+           'organization', 'athena_id', 'prospect_manager')
+
+
+def _values(prefix):
+    return ', '.join(f'{prefix}.{column}' for column in COLUMNS)
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'sqlite':
+        columns = ', '.join(COLUMNS)
+        op.execute(f"""CREATE VIRTUAL TABLE guest_fts USING fts5(
+            {columns},
+            content='guest', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )""")
+        op.execute(f"""CREATE TRIGGER guest_fts_ai AFTER INSERT ON guest BEGIN
+            INSERT INTO guest_fts(rowid, {columns})
+            VALUES (new.id, {_values('new')});
+        END""")
+        op.execute(f"""CREATE TRIGGER guest_fts_ad AFTER DELETE ON guest BEGIN
+            INSERT INTO guest_fts(guest_fts, rowid, {columns})
+            VALUES ('delete', old.id, {_values('old')});
+        END""")
+        op.execute(f"""CREATE TRIGGER guest_fts_au AFTER UPDATE OF {columns} ON guest BEGIN
+            INSERT INTO guest_fts(guest_fts, rowid, {columns})
+            VALUES ('delete', old.id, {_values('old')});
+            INSERT INTO guest_fts(rowid, {columns})
+            VALUES (new.id, {_values('new')});
+        END""")
+
+        # Index the guests that already exist
+        op.execute("INSERT INTO guest_fts(guest_fts) VALUES ('rebuild')")
+
+    elif bind.dialect.name == 'postgresql':
+        document = " || ' ' || ".join(f"coalesce({column}, '')" for column in COLUMNS)
+        op.execute(f"CREATE INDEX ix_guest_search ON guest USING GIN (to_tsvector('simple'::regconfig, {document}))")
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS guest_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS guest_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS guest_fts_ai")
+        op.execute("DROP TABLE IF EXISTS guest_fts")
+
+    elif bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_guest_search")
@@ -0,0 +1,57 @@
+import pytest
+
+from app import create_app
+from app.config import TestingConfig
+from app.models import db, User
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestingConfig):
+        UPLOAD_PATH = str(tmp_path / 'photos')
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='alice', email='alice@example.com')
+    user.set_password('password1')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def client(app, user):
+    """A test client logged in as user."""
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'alice', 'password': 'password1'})
+    return client
+
+
+@pytest.fixture
+def count_queries(app):
+    """Return a context manager that collects the SQL statements run inside it."""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counter
@@ -0,0 +1,131 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import db, Guest, Event, EventAttendance, User, get_data_version
+from app.services.attendance import (
+    BULK_ATTENDANCE_LIMIT, add_attendees, mark_attended, remove_attendances
+)
+
+
+@pytest.fixture
+def guests(user):
+    guests = [Guest(first_name=f'First{i}', last_name=f'Last{i}', user_id=user.id) for i in range(5)]
+    db.session.add_all(guests)
+    db.session.commit()
+    return [guest.id for guest in guests]
+
+
+@pytest.fixture
+def events(app):
+    events = [Event(name='Gala', date=datetime(2026, 5, 1)), Event(name='Lecture', date=datetime(2026, 6, 1))]
+    db.session.add_all(events)
+    db.session.commit()
+    return [event.id for event in events]
+
+
+def _attend(event_id, guest_ids):
+    attendances = [EventAttendance(event_id=event_id, guest_id=guest_id) for guest_id in guest_ids]
+    db.session.add_all(attendances)
+    db.session.commit()
+    return [attendance.id for attendance in attendances]
+
+
+def _attending(event_id):
+    return sorted(
+        guest_id for guest_id, in
+        db.session.execute(db.select(EventAttendance.guest_id).where(EventAttendance.event_id == event_id))
+    )
+
+
+def _versions(event_id):
+    db.session.expire_all()
+    event = db.session.get(Event, event_id)
+    return event.attendance_version, event.engagement_version
+
+
+def test_add_attendees_skips_existing_and_other_users_guests(user, guests, events):
+    other_user = User(username='bob', email='bob@example.com')
+    db.session.add(other_user)
+    db.session.flush()
+    stranger = Guest(first_name='Not', last_name='Mine', user_id=other_user.id)
+    db.session.add(stranger)
+    db.session.commit()
+    _attend(events[0], guests[:2])
+    attendance_version, engagement_version = _versions(events[0])
+    global_version = get_data_version('attendance')
+
+    result = add_attendees(events[0], guests + [stranger.id, 'x', -1], user.id)
+
+    assert result['success'], result['message']
+    assert (result['requested'], result['affected']) == (6, 3)
+    assert _attending(events[0]) == guests
+    assert _versions(events[0]) == (attendance_version + 1, engagement_version + 1)
+    assert get_data_version('attendance') == global_version + 1
+
+
+def test_add_attendees_without_new_guests_leaves_versions_alone(user, guests, events):
+    _attend(events[0], guests)
+    versions = _versions(events[0])
+
+    result = add_attendees(events[0], guests, user.id)
+
+    assert result['success'], result['message']
+    assert result['affected'] == 0
+    assert _versions(events[0]) == versions
+
+
+def test_remove_attendances_only_touches_the_event(user, guests, events):
+    first = _attend(events[0], guests[:3])
+    second = _attend(events[1], guests[:1])
+    attendance_version, engagement_version = _versions(events[0])
+    other_versions = _versions(events[1])
+
+    result = remove_attendances(events[0], first[:2] + second)
+
+    assert result['success'], result['message']
+    assert result['affected'] == 2
+    assert _attending(events[0]) == guests[2:3]
+    assert _attending(events[1]) == guests[:1]
+    assert _versions(events[0]) == (attendance_version + 1, engagement_version + 1)
+    assert _versions(events[1]) == other_versions
+
+
+def test_mark_attended_checks_in_and_bumps_engagement_only(user, guests, events):
+    attendance_ids = _attend(events[0], guests[:3])
+    attendance_version, engagement_version = _versions(events[0])
+
+    result = mark_attended(events[0], attendance_ids[:2])
+    repeated = mark_attended(events[0], attendance_ids[:2])
+
+    assert (result['affected'], repeated['affected']) == (2, 0)
+    assert [a.attended for a in EventAttendance.query.order_by(EventAttendance.id)] == [True, True, False]
+    assert _versions(events[0]) == (attendance_version, engagement_version + 1)
+
+    result = mark_attended(events[0], attendance_ids[:1], attended=False)
+
+    assert result['affected'] == 1
+    assert _versions(events[0]) == (attendance_version, engagement_version + 2)
+
+
+def _run(operation, event_id, ids, user_id):
+    if operation is add_attendees:
+        return operation(event_id, ids, user_id)
+    return operation(event_id, ids)
+
+
+@pytest.mark.parametrize('operation', [add_attendees, remove_attendances, mark_attended])
+def test_bulk_operations_reject_more_than_the_limit(user, events, operation):
+    result = _run(operation, events[0], range(1, BULK_ATTENDANCE_LIMIT + 2), user.id)
+
+    assert not result['success']
+    assert str(BULK_ATTENDANCE_LIMIT) in result['message']
+    assert _versions(events[0]) == (0, 0)
+
+
+@pytest.mark.parametrize('operation', [add_attendees, remove_attendances, mark_attended])
+def test_bulk_operations_require_a_selection(user, events, operation):
+    result = _run(operation, events[0], ['', None], user.id)
+
+    assert not result['success']
+    assert result['message'] == "No attendees were selected."
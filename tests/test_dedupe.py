@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import db, Guest, Event, EventAttendance
+from app.services import dedupe
+from app.services.dedupe import find_duplicate_groups, merge_guests
+
+
+@pytest.fixture(autouse=True)
+def clear_duplicate_cache():
+    # Every test starts a fresh database whose versions restart too
+    dedupe._duplicate_cache.clear()
+
+
+def _add_guests(user, *guests):
+    for guest in guests:
+        guest.user_id = user.id
+    db.session.add_all(guests)
+    db.session.commit()
+    return [guest.id for guest in guests]
+
+
+def test_groups_nicknames_and_emails(user):
+    bob, robert, other = _add_guests(
+        user,
+        Guest(first_name='Bob', last_name='Smith'),
+        Guest(first_name='Robert', last_name='Smith', email='RSmith@example.com'),
+        Guest(first_name='Rob', last_name='Smyth', email='rsmith@example.com'),
+    )
+
+    groups = find_duplicate_groups(user)
+
+    assert groups == [{'ids': [bob, robert, other], 'reasons': ['name', 'email']}]
+
+
+def test_name_match_never_joins_different_athena_ids(user):
+    no_id, first, second = _add_guests(
+        user,
+        Guest(first_name='Robert', last_name='Smith'),
+        Guest(first_name='Bob', last_name='Smith', athena_id='X1'),
+        Guest(first_name='Robert', last_name='Smith', athena_id='Y2'),
+    )
+
+    groups = find_duplicate_groups(user)
+
+    assert [group['ids'] for group in groups] == [[no_id, first]]
+
+
+def test_merge_moves_attendances_and_fills_fields(user):
+    primary, duplicate = _add_guests(
+        user,
+        Guest(first_name='Robert', last_name='Smith', donor_capacity='TBD'),
+        Guest(first_name='Bob', last_name='Smith', organization='Example Org', donor_capacity='$1M'),
+    )
+    shared, other = Event(name='Shared', date=datetime(2026, 1, 1)), Event(name='Other', date=datetime(2026, 2, 1))
+    db.session.add_all([shared, other])
+    db.session.flush()
+    db.session.add_all([
+        EventAttendance(event_id=shared.id, guest_id=primary),
+        EventAttendance(event_id=shared.id, guest_id=duplicate, attended=True),
+        EventAttendance(event_id=other.id, guest_id=duplicate),
+    ])
+    db.session.commit()
+
+    result = merge_guests(user.id, primary, [primary, duplicate])
+
+    assert result['success'], result['message']
+    assert result['merged'] == 1 and result['moved'] == 1
+    guest = db.session.get(Guest, primary)
+    assert guest.organization == 'Example Org'
+    assert guest.donor_capacity == '$1M'
+    assert db.session.get(Guest, duplicate) is None
+    attendances = EventAttendance.query.filter_by(guest_id=primary).all()
+    assert sorted((a.event_id, a.attended) for a in attendances) == [(shared.id, True), (other.id, False)]
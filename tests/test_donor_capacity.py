@@ -0,0 +1,52 @@
+import pytest
+
+from app.config import Config
+from app.services.donor_capacity import parse_donor_capacity
+
+
+@pytest.mark.parametrize('value, amount', [
+    # Amounts, with scale suffixes and thousands separators
+    ('$1M+', 1_000_000),
+    ('1.5M', 1_500_000),
+    ('$250K', 250_000),
+    ('250k+', 250_000),
+    ('$1,000,000', 1_000_000),
+    ('$2B', 2_000_000_000),
+    ('50000', 50_000),
+    # Ranges take their lower bound
+    ('$100K-$250K', 100_000),
+    ('$25,000 - $50,000', 25_000),
+    ('$1M to $5M', 1_000_000),
+    # Configured labels, case-insensitive and ignoring a trailing "+"
+    ('High', 1_000_000),
+    ('high+', 1_000_000),
+    ('  MEDIUM ', 100_000),
+    ('TBD', None),
+    ('Unknown', None),
+    # Configured rating scale
+    ('1', 10_000_000),
+    ('5', 250_000),
+    ('9', 10_000),
+    # Not ratings: out of scale, or written as amounts
+    ('10', 10),
+    ('$5', 5),
+    ('5K', 5_000),
+    # Nothing to go on
+    ('', None),
+    ('   ', None),
+    (None, None),
+    ('Major gift prospect', None),
+    ('Millions', None),
+])
+def test_parse_donor_capacity(value, amount):
+    assert parse_donor_capacity(value, Config.DONOR_CAPACITY_LABELS, Config.DONOR_CAPACITY_RATINGS) == amount
+
+
+@pytest.mark.parametrize('value, amount', [
+    ('TBD', None),
+    ('High', None),
+    ('5', 5),
+    ('$1M+', 1_000_000),
+])
+def test_parse_donor_capacity_without_labels_or_ratings(value, amount):
+    assert parse_donor_capacity(value) == amount
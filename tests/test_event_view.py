@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import db, Guest, Event, EventAttendance
+
+
+def _event_with_attendees(user, count):
+    event = Event(name=f'Lecture for {count}', date=datetime(2026, 3, 1))
+    guests = [
+        Guest(first_name=f'First{i}', last_name=f'Last{i}', email=f'guest{count}.{i}@example.com',
+              organization='Example Org', user_id=user.id)
+        for i in range(count)
+    ]
+    db.session.add(event)
+    db.session.add_all(guests)
+    db.session.flush()
+    db.session.add_all(EventAttendance(event_id=event.id, guest_id=guest.id) for guest in guests)
+    db.session.commit()
+    return event.id
+
+
+def _view_queries(client, count_queries, event_id):
+    # Warm the per-worker caches so only the page's own queries are counted
+    client.get(f'/events/{event_id}')
+    db.session.expire_all()
+    with count_queries() as statements:
+        response = client.get(f'/events/{event_id}')
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_event_view_query_count_does_not_grow_with_attendees(client, user, count_queries):
+    counts = [
+        _view_queries(client, count_queries, _event_with_attendees(user, size))
+        for size in (1, 10, 50)
+    ]
+
+    assert counts[0] == counts[1] == counts[2], counts
+
+
+def test_event_view_lists_attendees(client, user):
+    event_id = _event_with_attendees(user, 3)
+
+    response = client.get(f'/events/{event_id}')
+
+    assert response.status_code == 200
+    for i in range(3):
+        assert f'First{i} Last{i}'.encode() in response.data
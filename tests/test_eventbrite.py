@@ -0,0 +1,136 @@
+import io
+from datetime import datetime
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.models import db, Guest, Event, EventAttendance
+from app.services.eventbrite import sync_eventbrite_export
+
+HEADER = 'Order #,First Name,Last Name,Email,Attendee #,Attendee Status\n'
+
+# order number, attendee number, guest index, status
+REGISTRATIONS = [
+    (1001, 'A1', 0, 'Attending'),
+    (1001, 'A2', 1, 'Attending'),
+    (1002, 'A3', 2, 'Attending'),
+    (1003, 'A4', 3, 'Attending'),
+]
+
+
+@pytest.fixture
+def guests(user):
+    guests = [
+        Guest(first_name=f'First{i}', last_name=f'Last{i}', email=f'guest{i}@example.com', user_id=user.id)
+        for i in range(5)
+    ]
+    db.session.add_all(guests)
+    db.session.commit()
+    return [guest.id for guest in guests]
+
+
+@pytest.fixture
+def event(app):
+    event = Event(name='Gala', date=datetime(2026, 5, 1))
+    db.session.add(event)
+    db.session.commit()
+    return event
+
+
+def _export(registrations):
+    rows = ''.join(
+        f'{order},First{i},Last{i},guest{i}@example.com,{attendee},{status}\n'
+        for order, attendee, i, status in registrations
+    )
+    return FileStorage(io.BytesIO((HEADER + rows).encode()), filename='export.csv')
+
+
+def _sync(event, user, registrations):
+    result = sync_eventbrite_export(_export(registrations), event, user.id)
+    assert result['success'], result['message']
+    return result
+
+
+def _attendees(event, guests):
+    return {
+        guests.index(attendance.guest_id): attendance
+        for attendance in EventAttendance.query.filter_by(event_id=event.id)
+    }
+
+
+def test_first_sync_adds_registrations_and_sets_watermark(user, guests, event):
+    result = _sync(event, user, REGISTRATIONS)
+
+    assert result['added'] == 4
+    assert sorted(_attendees(event, guests)) == [0, 1, 2, 3]
+    assert _attendees(event, guests)[0].eventbrite_attendee_id == 'A1'
+    assert event.eventbrite_last_order == 1003
+
+
+def test_resync_of_unchanged_export_writes_nothing(user, guests, event):
+    _sync(event, user, REGISTRATIONS)
+    versions = (event.attendance_version, event.engagement_version)
+
+    result = _sync(event, user, REGISTRATIONS)
+
+    assert (result['added'], result['updated'], result['removed'], result['unchanged']) == (0, 0, 0, 4)
+    assert (event.attendance_version, event.engagement_version) == versions
+
+
+def test_changed_row_is_updated(user, guests, event):
+    _sync(event, user, REGISTRATIONS)
+    engagement_version = event.engagement_version
+    checked_in = list(REGISTRATIONS)
+    checked_in[2] = (1002, 'A3', 2, 'Checked In')
+
+    result = _sync(event, user, checked_in)
+
+    assert (result['updated'], result['unchanged']) == (1, 3)
+    assert _attendees(event, guests)[2].attended
+    assert event.engagement_version > engagement_version
+
+
+def test_cancelled_registration_is_removed(user, guests, event):
+    _sync(event, user, REGISTRATIONS)
+    cancelled = list(REGISTRATIONS)
+    cancelled[3] = (1003, 'A4', 3, 'Not Attending')
+
+    result = _sync(event, user, cancelled)
+
+    assert result['removed'] == 1
+    assert sorted(_attendees(event, guests)) == [0, 1, 2]
+
+
+def test_attendee_missing_from_exported_order_is_removed(user, guests, event):
+    _sync(event, user, REGISTRATIONS)
+    attendance_version = event.attendance_version
+
+    # Order 1001 is exported with only one of its two tickets left
+    result = _sync(event, user, [r for r in REGISTRATIONS if r[1] != 'A2'])
+
+    assert result['removed'] == 1
+    assert sorted(_attendees(event, guests)) == [0, 2, 3]
+    assert event.attendance_version > attendance_version
+
+
+def test_partial_export_keeps_attendees_of_orders_it_leaves_out(user, guests, event):
+    _sync(event, user, REGISTRATIONS)
+
+    # A delta export holding only a new order, then one holding a single old one
+    delta = _sync(event, user, [(1004, 'A5', 4, 'Attending')])
+    partial = _sync(event, user, [REGISTRATIONS[2]])
+
+    assert (delta['added'], delta['removed'], delta['new_orders']) == (1, 0, 1)
+    assert (partial['removed'], partial['unchanged']) == (0, 1)
+    assert sorted(_attendees(event, guests)) == [0, 1, 2, 3, 4]
+    assert event.eventbrite_last_order == 1004
+
+
+def test_hand_added_attendance_is_linked_not_duplicated(user, guests, event):
+    db.session.add(EventAttendance(event_id=event.id, guest_id=guests[1]))
+    db.session.commit()
+
+    result = _sync(event, user, REGISTRATIONS)
+
+    assert (result['added'], result['updated']) == (3, 1)
+    assert EventAttendance.query.filter_by(event_id=event.id, guest_id=guests[1]).one().eventbrite_attendee_id == 'A2'
@@ -0,0 +1,45 @@
+import csv
+import io
+
+from openpyxl import load_workbook
+
+from app.models import db, Guest
+from app.services.exports import escape_formula, iter_csv, iter_xlsx, unescape_formula
+
+DANGEROUS = ['=HYPERLINK("http://example.com")', '+1 212 555 0100', '-2+3', '@SUM(A1)', '\t=1']
+
+
+def _guests(user):
+    guests = [
+        Guest(first_name='Jane', last_name=f'Smith{i}', organization=value, user_id=user.id)
+        for i, value in enumerate(DANGEROUS)
+    ]
+    db.session.add_all(guests)
+    db.session.commit()
+    return guests
+
+
+def test_escape_formula_round_trips():
+    for value in DANGEROUS:
+        assert escape_formula(value) == "'" + value
+        assert unescape_formula(escape_formula(value)) == value
+    assert escape_formula('Example Org') == 'Example Org'
+    assert escape_formula(42) == 42
+    assert unescape_formula("'quoted") == "'quoted"
+
+
+def test_csv_export_escapes_formulas(user):
+    rows = list(csv.DictReader(io.StringIO(''.join(iter_csv(_guests(user))).lstrip('\ufeff'))))
+
+    assert [row['Organization'] for row in rows] == [escape_formula(value) for value in DANGEROUS]
+
+
+def test_xlsx_export_writes_formulas_as_text(user):
+    workbook = load_workbook(io.BytesIO(b''.join(iter_xlsx(_guests(user)))))
+    sheet = workbook.active
+    column = [cell.value for cell in sheet[1]].index('Organization') + 1
+
+    cells = [sheet.cell(row=row, column=column) for row in range(2, len(DANGEROUS) + 2)]
+
+    assert [cell.value for cell in cells] == DANGEROUS
+    assert all(cell.data_type == 's' and cell.quotePrefix for cell in cells)
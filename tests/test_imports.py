@@ -0,0 +1,35 @@
+import io
+import zipfile
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.models import db, Guest
+from app.services.import_service import process_photo_archive
+
+
+def _archive(*names):
+    image = io.BytesIO()
+    Image.new('RGB', (60, 40), 'red').save(image, 'PNG')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name in names:
+            archive.writestr(name, image.getvalue())
+    buffer.seek(0)
+    return FileStorage(buffer, filename='photos.zip')
+
+
+def test_photo_archive_matches_hyphenated_athena_ids(user):
+    guests = [
+        Guest(first_name='Jane', last_name='Smith', athena_id='AB-1234', user_id=user.id),
+        Guest(first_name='John', last_name='Doe', athena_id='CD 56', user_id=user.id),
+    ]
+    db.session.add_all(guests)
+    db.session.commit()
+
+    result = process_photo_archive(_archive('photos/AB-1234.png', 'photos/portrait_cd-56_2024.png'), user.id)
+
+    assert result['success'], result['message']
+    assert result['matched'] == 2
+    assert result['unmatched_files'] == []
+    assert all(guest.photo_filename for guest in Guest.query)
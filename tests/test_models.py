@@ -0,0 +1,74 @@
+from datetime import datetime
+
+from sqlalchemy.orm import load_only
+
+from app.models import db, Guest, Event, EventAttendance, GUEST_LIST_COLUMNS
+
+
+def _event_versions(event_ids):
+    return {
+        event_id: (version, engagement)
+        for event_id, version, engagement in db.session.execute(
+            db.select(Event.id, Event.attendance_version, Event.engagement_version)
+            .where(Event.id.in_(event_ids))
+        )
+    }
+
+
+def test_moving_attendance_to_another_guest_bumps_only_its_event(user):
+    # Guest and event ids both start at 1, so guest ids mistaken for event
+    # ids would hit the other events
+    events = [Event(name=f'Event {n}', date=datetime(2024, 1, n + 1)) for n in range(3)]
+    first = Guest(first_name='Jane', last_name='Smith', user_id=user.id)
+    second = Guest(first_name='John', last_name='Doe', user_id=user.id)
+    db.session.add_all(events + [first, second])
+    db.session.commit()
+    attendance = EventAttendance(guest_id=first.id, event_id=events[2].id)
+    db.session.add(attendance)
+    db.session.commit()
+    other_ids = [events[0].id, events[1].id]
+    assert {first.id, second.id} == set(other_ids)
+    before = _event_versions(other_ids)
+    moved_before = _event_versions([events[2].id])[events[2].id]
+
+    attendance.guest_id = second.id
+    db.session.commit()
+
+    assert _event_versions(other_ids) == before
+    assert _event_versions([events[2].id])[events[2].id] == tuple(v + 1 for v in moved_before)
+
+
+def _rename_guests(user_id, count_queries, count):
+    guests = [
+        Guest(first_name=f'First{i}', last_name=f'Last{i}', donor_capacity='$1M+', user_id=user_id)
+        for i in range(count)
+    ]
+    db.session.add_all(guests)
+    db.session.commit()
+    ids = [guest.id for guest in guests]
+    db.session.expunge_all()
+
+    with count_queries() as statements:
+        for guest in Guest.query.options(load_only(*GUEST_LIST_COLUMNS)).filter(Guest.id.in_(ids)):
+            guest.nickname = 'Changed'
+        db.session.commit()
+    return len(statements)
+
+
+def test_updating_partially_loaded_guests_does_not_load_donor_capacity(user, count_queries):
+    user_id = user.id
+    counts = [_rename_guests(user_id, count_queries, size) for size in (1, 20)]
+
+    assert counts[0] == counts[1], counts
+
+
+def test_changing_donor_capacity_rescores_it(user):
+    guest = Guest(first_name='Jane', last_name='Smith', donor_capacity='$1M+', user_id=user.id)
+    db.session.add(guest)
+    db.session.commit()
+    assert guest.donor_capacity_amount == 1_000_000
+
+    guest.donor_capacity = '$25,000 - $50,000'
+    db.session.commit()
+
+    assert guest.donor_capacity_amount == 25_000
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import db, Event, Guest
+from app.services.pagination import encode_cursor, keyset_paginate
+
+
+@pytest.fixture
+def guests(user):
+    organizations = ['Acme', None, 'Beta', None, 'Acme', 'Zeta', None, 'Beta', 'Acme', None, 'Gamma']
+    db.session.add_all(
+        Guest(first_name=f'First{i}', last_name=f'Last{i}', organization=organization, user_id=user.id)
+        for i, organization in enumerate(organizations)
+    )
+    db.session.commit()
+    return Guest.query.filter_by(user_id=user.id)
+
+
+def _walk(query, keys, per_page=3):
+    """Page forwards to the end, then backwards to the start."""
+    forward, cursor = [], None
+    while True:
+        page = keyset_paginate(query, keys, cursor=cursor, per_page=per_page)
+        forward.append([guest.id for guest in page.items])
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+
+    backward = [forward[-1]]
+    while page.has_prev:
+        page = keyset_paginate(query, keys, cursor=page.prev_cursor, per_page=per_page)
+        backward.insert(0, [guest.id for guest in page.items])
+    return forward, backward
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_nullable_sort_key_pages_match_a_full_sort(guests, descending):
+    keys = [(Guest.organization, descending), (Guest.id, descending)]
+    expected = [guest.id for guest in guests.order_by(Guest.organization.desc() if descending else Guest.organization.asc(),
+                                                        Guest.id.desc() if descending else Guest.id.asc())]
+
+    forward, backward = _walk(guests, keys)
+
+    assert sum(forward, []) == expected
+    assert backward == forward
+
+
+@pytest.mark.parametrize('values', [
+    ['not a date', 1],
+    [{'dt': '2026-13-45'}, 1],
+    [{'x': 1}, 1],
+    [[1, 2], 1],
+    [{'dt': '2026-01-01T00:00:00'}, 'one'],
+])
+def test_tampered_cursor_starts_at_the_first_page(app, values):
+    db.session.add_all(Event(name=f'Event {i}', date=datetime(2026, 1, i + 1)) for i in range(5))
+    db.session.commit()
+    keys = [(Event.date, False), (Event.id, False)]
+
+    page = keyset_paginate(Event.query, keys, cursor=encode_cursor(values, 'next'), per_page=2)
+
+    assert [event.name for event in page.items] == ['Event 0', 'Event 1']
+    assert not page.has_prev
+
+
+def test_tampered_cursor_is_ignored_by_the_listing(client):
+    response = client.get('/events/', query_string={'cursor': encode_cursor(['not a date', 1], 'next')})
+
+    assert response.status_code == 200
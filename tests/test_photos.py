@@ -0,0 +1,103 @@
+import io
+import os
+import threading
+import time
+
+from PIL import Image
+
+from app import create_app
+from app.config import TestingConfig
+from app.models import db, Guest, Photo
+from app.services.photo import delete_photo, photo_path, process_image, store_photo
+
+
+def _photo_bytes(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (600, 400), color).save(buffer, 'PNG')
+    return process_image(buffer.getvalue())
+
+
+def _guest_with_photo(user):
+    guest = Guest(first_name='Jane', last_name='Smith', user_id=user.id)
+    guest.photo_filename = store_photo(*_photo_bytes())
+    db.session.add(guest)
+    db.session.commit()
+    return guest
+
+
+def test_store_photo_shares_identical_content(user):
+    first = store_photo(*_photo_bytes())
+    second = store_photo(*_photo_bytes())
+    db.session.commit()
+
+    assert first == second
+    assert Photo.query.filter_by(filename=first).one().ref_count == 2
+
+
+def test_released_photo_survives_a_rollback(user):
+    guest = _guest_with_photo(user)
+    filename = guest.photo_filename
+
+    delete_photo(filename)
+    db.session.delete(guest)
+    db.session.rollback()
+
+    assert os.path.exists(photo_path(filename))
+    assert db.session.get(Guest, guest.id).photo_filename == filename
+    assert Photo.query.filter_by(filename=filename).one().ref_count == 1
+
+
+def test_released_photo_file_is_left_for_gc(user):
+    guest = _guest_with_photo(user)
+    filename = guest.photo_filename
+
+    delete_photo(filename)
+    db.session.delete(guest)
+    db.session.commit()
+
+    assert os.path.exists(photo_path(filename))
+    assert Photo.query.filter_by(filename=filename).one().ref_count == 0
+
+
+def test_concurrent_uploads_of_new_content_share_one_row(tmp_path):
+    # Two sessions on a file database, so the second upload runs while the
+    # first one's transaction is still open
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'race.db'}"
+        UPLOAD_PATH = str(tmp_path / 'photos')
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        images = _photo_bytes()
+    first_stored = threading.Event()
+    errors = []
+
+    def upload(wait_for=None, then_set=None):
+        with app.app_context():
+            try:
+                if wait_for:
+                    wait_for.wait()
+                store_photo(*images)
+                if then_set:
+                    then_set.set()
+                    time.sleep(0.2)
+                db.session.commit()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [
+        threading.Thread(target=upload, kwargs={'then_set': first_stored}),
+        threading.Thread(target=upload, kwargs={'wait_for': first_stored}),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        photos = Photo.query.all()
+        db.session.remove()
+        db.engine.dispose()
+    assert errors == []
+    assert [photo.ref_count for photo in photos] == [2]
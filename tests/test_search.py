@@ -0,0 +1,70 @@
+import os
+
+import pytest
+from flask_migrate import upgrade
+
+from app import create_app
+from app.config import TestingConfig
+from app.models import db, Guest, User
+from app.services.search import search_guests
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+
+@pytest.fixture(params=['create_all', 'migrations'])
+def search_app(request, tmp_path):
+    """An app whose FTS5 table was made by create_all() or by the migrations."""
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'search.db'}"
+
+    app = create_app(Config)
+    with app.app_context():
+        if request.param == 'migrations':
+            upgrade(directory=MIGRATIONS)
+        else:
+            db.create_all()
+        user = User(username='alice', email='alice@example.com')
+        db.session.add(user)
+        db.session.commit()
+        yield user.id
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _search(user_id, text):
+    query, _ = search_guests(Guest.query.filter_by(user_id=user_id), text)
+    return sorted(guest.id for guest in query)
+
+
+def test_search_follows_guest_inserts_updates_and_deletes(search_app):
+    user_id = search_app
+    jane = Guest(first_name='Jane', last_name='Smith', organization='Acme', user_id=user_id)
+    john = Guest(first_name='John', last_name='Smithers', user_id=user_id)
+    db.session.add_all([jane, john])
+    db.session.commit()
+
+    assert _search(user_id, 'smith') == [jane.id, john.id]
+    assert _search(user_id, 'jan smi') == [jane.id]
+    assert _search(user_id, 'acm') == [jane.id]
+
+    jane.last_name = 'Doe'
+    db.session.commit()
+
+    assert _search(user_id, 'smith') == [john.id]
+    assert _search(user_id, 'jane do') == [jane.id]
+    assert _search(user_id, 'acme') == [jane.id]
+
+    db.session.delete(john)
+    db.session.commit()
+
+    assert _search(user_id, 'smith') == []
+    assert _search(user_id, 'j') == [jane.id]
+
+
+def test_search_ignores_accents(search_app):
+    user_id = search_app
+    guest = Guest(first_name='José', last_name="O'Neil", user_id=user_id)
+    db.session.add(guest)
+    db.session.commit()
+
+    assert _search(user_id, 'jose') == [guest.id]